@@ -0,0 +1,120 @@
+# Throughput of GeminiService code paths against the offline fake backend.
+#
+#   python -m benchmarks.bench_gemini_service --calls 500 --concurrency 50 \
+#       --latency lognormal:800:0.4 --error-rate 0.02
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_NAME", os.path.join(tempfile.mkdtemp(), "bench.db")
+)
+
+from PIL import Image
+
+from database.db_utils import init_db
+from bot.services.gemini_backends import FakeGeminiBackend
+from bot.services.image_pipeline import preprocess_image
+from bot.services.gemini_schemas import get_schema_stats
+from bot.services.gemini_service import GeminiService, gemini_rate_limiter
+from bot.services.usage_tracker import usage_tracker
+
+
+def make_image_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def scenarios(service: GeminiService, raw_image: bytes) -> dict:
+    image = preprocess_image(raw_image)
+    human = {"native": "English", "learning": "Spanish"}
+    programming = {"programming": "Python", "interface_lang_name": "English"}
+    return {
+        "translate": lambda i: service.translate_text(f"hello {i}", "Spanish"),
+        "ocr": lambda i: service.get_text_from_image(image, "Spanish"),
+        "word": lambda i: service.get_learning_item("word", "human", human, "A1/A2"),
+        "quiz": lambda i: service.get_learning_item("quiz", "human", human, "A1/A2"),
+        "concept": lambda i: service.get_learning_item(
+            "concept", "programming", programming, "Beginner"
+        ),
+        "fact": lambda i: service.get_fun_fact("human", "Spanish", "English"),
+        "evaluate": lambda i: service.evaluate_user_answer(
+            "casa", "house", "Spanish", "English"
+        ),
+        "chat": lambda i: service.chat_with_ai(i % 100, f"message {i}"),
+    }
+
+
+async def run_scenario(call, calls: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            result = await call(i)
+            latencies.append(time.perf_counter() - started)
+            if not result:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "throughput": calls / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "failures": failures,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", default="lognormal:800:0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--only", nargs="*")
+    parser.add_argument("--rpm", type=float, help="override GEMINI_RPM for the run")
+    args = parser.parse_args()
+    if args.rpm:
+        gemini_rate_limiter.rate = args.rpm / 60
+
+    await init_db()
+    backend = FakeGeminiBackend(
+        latency=args.latency, error_rate=args.error_rate,
+        tokens_per_second=args.tokens_per_second, seed=42
+    )
+    service = GeminiService(backend=backend)
+
+    print(f"{'scenario':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'failed':>7}")
+    for name, call in scenarios(service, make_image_bytes()).items():
+        if args.only and name not in args.only:
+            continue
+        result = await run_scenario(call, args.calls, args.concurrency)
+        print(
+            f"{name:<10} {result['throughput']:>9.1f} {result['p50_ms']:>9.1f} "
+            f"{result['p95_ms']:>9.1f} {result['failures']:>7}"
+        )
+    print("\nUsage per feature:")
+    for feature, stats in usage_tracker.aggregate(3600).items():
+        print(f"  {feature}: {stats}")
+    print("\nLatency per route:")
+    for route, stats in usage_tracker.aggregate(3600, group_by="route").items():
+        print(f"  {route}: avg {stats['avg_latency_ms']} ms, p95 {stats['p95_latency_ms']} ms")
+    print(f"\nRate limiter: {gemini_rate_limiter.snapshot()}")
+    print("\nSchema stats:")
+    for name, stats in get_schema_stats().items():
+        print(f"  {name}: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
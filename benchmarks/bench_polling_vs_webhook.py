@@ -0,0 +1,133 @@
+# Delivery latency of updates with long polling vs. the webhook server, both
+# against a local fake Bot API. --rtt adds a delay to every Bot API response
+# to approximate the round trip to api.telegram.org.
+#
+#   python -m benchmarks.bench_polling_vs_webhook --updates 500 --rate 100 --rtt 0.05
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+from aiogram import Dispatcher, Router
+from aiogram.types import Message
+from aiohttp import web
+
+from benchmarks.fake_telegram import FakeTelegramServer, make_message_update
+from bot.webhook import build_webhook_app
+
+SECRET = "benchmark-secret"
+
+
+def make_dispatcher(sent_at: dict, latencies: list, done: asyncio.Event, total: int, reply: bool) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def record(message: Message):
+        latencies.append(time.perf_counter() - sent_at[message.message_id])
+        if reply:
+            await message.answer("ok")
+        if len(latencies) >= total:
+            done.set()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def inject(args, push):
+    interval = 1 / args.rate
+    started = time.perf_counter()
+    tasks = []
+    for i in range(args.updates):
+        delay = started + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(push(i)))
+    await asyncio.gather(*tasks)
+
+
+async def run_polling(args) -> dict:
+    api = FakeTelegramServer(rtt=args.rtt)
+    await api.start()
+    bot = api.make_bot()
+    sent_at, latencies, done = {}, [], asyncio.Event()
+    dp = make_dispatcher(sent_at, latencies, done, args.updates, args.reply)
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+
+    async def push(i):
+        update_id = api.next_update_id()
+        sent_at[update_id] = time.perf_counter()
+        await api.add_update(make_message_update(update_id, 1000 + i % 50, "ping"))
+
+    started = time.perf_counter()
+    await inject(args, push)
+    await asyncio.wait_for(done.wait(), 60)
+    elapsed = time.perf_counter() - started
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+    await api.stop()
+    return summarize(latencies, elapsed, [], api.calls)
+
+
+async def run_webhook(args) -> dict:
+    api = FakeTelegramServer(rtt=args.rtt)
+    await api.start()
+    bot = api.make_bot()
+    sent_at, latencies, done = {}, [], asyncio.Event()
+    dp = make_dispatcher(sent_at, latencies, done, args.updates, args.reply)
+    runner = web.AppRunner(build_webhook_app(bot, dp, path="/webhook", secret_token=SECRET, webhook_url=None))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/webhook"
+
+    acks = []
+    async with aiohttp.ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as http:
+        async def push(i):
+            update_id = api.next_update_id()
+            sent_at[update_id] = time.perf_counter()
+            async with http.post(url, json=make_message_update(update_id, 1000 + i % 50, "ping")) as response:
+                assert response.status == 200, response.status
+            acks.append(time.perf_counter() - sent_at[update_id])
+
+        started = time.perf_counter()
+        await inject(args, push)
+        await asyncio.wait_for(done.wait(), 60)
+        elapsed = time.perf_counter() - started
+
+    await runner.cleanup()
+    await bot.session.close()
+    await api.stop()
+    return summarize(latencies, elapsed, acks, api.calls)
+
+
+def summarize(latencies: list, elapsed: float, acks: list, calls: dict) -> dict:
+    latencies = sorted(latencies)
+    result = {
+        "updates/s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "api_calls": dict(calls),
+    }
+    if acks:
+        result["ack_p50_ms"] = round(statistics.median(acks) * 1000, 2)
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=100, help="updates per second")
+    parser.add_argument("--rtt", type=float, default=0.05, help="seconds added to each Bot API call")
+    parser.add_argument("--reply", action="store_true", help="answer every update with sendMessage")
+    args = parser.parse_args()
+
+    for mode, run in (("polling", run_polling), ("webhook", run_webhook)):
+        print(f"{mode:<8} {await run(args)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+# Throughput of the multi-process supervisor (bot/supervisor.py) with 1, 2, 4
+# workers, against a local fake Bot API. Each update runs --cpu-ms of pure
+# Python work before replying, i.e. the part a single event loop can't
+# overlap. Speedup is bounded by the number of cores on the machine.
+#
+#   python -m benchmarks.bench_worker_scaling --updates 400 --cpu-ms 10 --workers 1,2,4
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.fake_telegram import BOT_TOKEN, FakeTelegramServer, make_message_update
+
+# Workers are spawned processes that read config from the environment.
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", BOT_TOKEN)
+os.environ.setdefault("DATABASE_NAME", os.path.join(tempfile.gettempdir(), "bench_worker_scaling.db"))
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+
+from aiogram import Dispatcher, Bot, Router
+from aiogram.types import Message
+
+from bot.supervisor import Supervisor, poll_updates
+
+
+def burn(ms: float):
+    deadline = time.perf_counter() + ms / 1000
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+    return n
+
+
+def create_bench_dispatcher(bot: Bot) -> Dispatcher:
+    cpu_ms = float(os.environ.get("BENCH_CPU_MS", "10"))
+    router = Router()
+
+    @router.message()
+    async def work(message: Message):
+        burn(cpu_ms)
+        await message.answer("ok")
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def run(workers: int, args) -> dict:
+    api = FakeTelegramServer(rtt=args.rtt)
+    await api.start()
+    api_url = f"http://127.0.0.1:{api.port}"
+    os.environ["TELEGRAM_API_URL"] = api_url
+
+    supervisor = Supervisor(workers, "benchmarks.bench_worker_scaling:create_bench_dispatcher")
+    supervisor.start()
+    poller = asyncio.create_task(poll_updates(supervisor, api_url=api_url, token=BOT_TOKEN))
+
+    # Warm-up: one update per worker, so process start-up isn't measured.
+    for i in range(workers):
+        await api.add_update(make_message_update(api.next_update_id(), 1000 + i, "warm-up"))
+    while api.calls.get("sendMessage", 0) < workers:
+        await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    for i in range(args.updates):
+        await api.add_update(make_message_update(api.next_update_id(), 1000 + i % args.users, "ping"))
+    target = workers + args.updates
+    while api.calls.get("sendMessage", 0) < target:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    poller.cancel()
+    await asyncio.gather(poller, return_exceptions=True)
+    health = supervisor.health()
+    await supervisor.stop()
+    await api.stop()
+    return {
+        "updates/s": round(args.updates / elapsed, 1),
+        "elapsed_s": round(elapsed, 2),
+        "per_worker": [w["processed"] for w in health["workers"]],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=400)
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--cpu-ms", type=float, default=10, help="CPU time spent per update")
+    parser.add_argument("--rtt", type=float, default=0.0, help="seconds added to each Bot API call")
+    parser.add_argument("--workers", default="1,2,4")
+    args = parser.parse_args()
+    os.environ["BENCH_CPU_MS"] = str(args.cpu_ms)
+
+    print(f"cores: {os.cpu_count()}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        print(f"workers={workers:<3} {await run(workers, args)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+# A local stand-in for the Telegram Bot API, for benchmarks that need a real
+# aiogram Bot talking HTTP. Updates pushed with add_update() are served to
+# getUpdates long polls; every other method returns a plausible result.
+import asyncio
+import itertools
+import time
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+BOT_TOKEN = "123456:benchmark-token"
+
+
+def make_message_update(update_id: int, user_id: int, text: str, chat_id: int | None = None) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id or user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "en"},
+            "text": text,
+        },
+    }
+
+
+class FakeTelegramServer:
+    def __init__(self, rtt: float = 0.0):
+        self.rtt = rtt
+        self.updates: list[dict] = []
+        self.calls: dict[str, int] = {}
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self._new_updates = asyncio.Condition()
+        self._runner: web.AppRunner | None = None
+        self.port = 0
+
+    def next_update_id(self) -> int:
+        return next(self.update_ids)
+
+    async def add_update(self, update: dict):
+        async with self._new_updates:
+            self.updates.append(update)
+            self._new_updates.notify_all()
+
+    async def _get_updates(self, params) -> list[dict]:
+        offset = int(params.get("offset", 0) or 0)
+        timeout = float(params.get("timeout", 0) or 0)
+        async with self._new_updates:
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            if not self.updates and timeout:
+                try:
+                    await asyncio.wait_for(self._new_updates.wait_for(lambda: self.updates), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return self.updates[:100]
+
+    def _result(self, method: str, params) -> object:
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if method in ("sendMessage", "editMessageText", "sendVoice", "sendDocument"):
+            chat_id = int(params.get("chat_id", 0))
+            message = {
+                "message_id": next(self.message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+            }
+            if "text" in params:
+                message["text"] = params["text"]
+            return message
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await request.post()
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+        else:
+            result = self._result(method, params)
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def make_bot(self, **session_kwargs) -> Bot:
+        session = AiohttpSession(
+            api=TelegramAPIServer.from_base(f"http://127.0.0.1:{self.port}"), **session_kwargs
+        )
+        return Bot(token=BOT_TOKEN, session=session)
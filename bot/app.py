@@ -0,0 +1,119 @@
+import asyncio
+from pathlib import Path
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import TELEGRAM_TOKEN, TELEGRAM_API_URL, TTS_SPECULATIVE
+from bot.middlewares.localization import Localization, get_all_translations
+from bot.middlewares.speculative_tts import SpeculativeTtsMiddleware
+from bot.middlewares.chat_scheduler import ChatScheduler
+from bot.middlewares.send_scheduler import send_scheduler
+from bot.middlewares.latest_wins import latest_wins
+from bot.middlewares.update_dedup import update_dedup
+from bot.middlewares.admission import AdmissionControl
+from bot.middlewares.update_classes import UpdateClassifier
+from bot.middlewares.throttling import ThrottlingMiddleware
+from bot.utils.metrics import register_metrics
+from bot.utils.http import TunedAiohttpSession
+from bot.utils.startup_profiler import startup_profiler
+from bot.services.gemini_backends import get_default_backend
+from bot.services.job_queue import job_runner
+from bot.handlers import (
+    common_handlers,
+    settings_handlers,
+    translate_handlers,
+    learning_handlers,
+    chat_handlers,
+)
+
+LOCALES_DIR = Path(__file__).resolve().parent.parent / "locales"
+
+
+def create_bot() -> Bot:
+    session = TunedAiohttpSession()
+    if TELEGRAM_API_URL != "https://api.telegram.org":
+        # Local Bot API server (or the benchmark's fake one).
+        session = TunedAiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL), proxy=None)
+    session.middleware(send_scheduler)
+    return Bot(
+        token=TELEGRAM_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+
+
+def create_dispatcher(bot: Bot) -> Dispatcher:
+    # Used by main.py in single-process mode and by every supervisor worker.
+    storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)
+    # First, so a duplicate update costs nothing further down.
+    dp.update.outer_middleware(update_dedup)
+    dp.update.outer_middleware(startup_profiler.first_update_middleware)
+    classifier = UpdateClassifier(locales_dir=LOCALES_DIR)
+    latest_wins.classifier = classifier
+    dp.update.outer_middleware(latest_wins)
+    chat_scheduler = ChatScheduler()
+    dp.update.outer_middleware(chat_scheduler)
+    register_metrics("chat_scheduler", chat_scheduler.snapshot)
+    # Behind the scheduler, so only updates that are actually running hold
+    # weight, not the ones queued behind their chat.
+    admission = AdmissionControl(classifier)
+    dp.update.outer_middleware(admission)
+    register_metrics("admission", admission.snapshot)
+
+    loc_middleware = Localization(locales_dir=LOCALES_DIR)
+    dp.update.middleware(loc_middleware)
+    bot.loc_middleware = loc_middleware
+    throttling = ThrottlingMiddleware()
+    dp.message.middleware(throttling)
+    register_metrics("throttling", throttling.snapshot)
+    if TTS_SPECULATIVE:
+        dp.message.middleware(SpeculativeTtsMiddleware())
+
+    dp.include_router(common_handlers.common_router)
+    dp.include_router(settings_handlers.settings_router)
+    dp.include_router(translate_handlers.translate_router)
+    dp.include_router(learning_handlers.learning_router)
+    dp.include_router(chat_handlers.chat_router)
+
+    # ------------------ Reply Keyboard Handlers ------------------
+    all_translate_texts = get_all_translations("translate_button", loc_middleware.locales)
+    @dp.message(F.text.in_(all_translate_texts))
+    async def handle_translate_text(message, user_db, state):
+        await translate_handlers.cb_enter_translator(message, user_db, state)
+
+    all_learn_texts = get_all_translations("learn_button", loc_middleware.locales)
+    @dp.message(F.text.in_(all_learn_texts))
+    async def handle_learn_text(message, user_db, state):
+        await learning_handlers.cb_main_menu_learn(message, user_db, state)
+
+    all_chat_texts = get_all_translations("chat_button", loc_middleware.locales)
+    @dp.message(F.text.in_(all_chat_texts))
+    async def handle_chat_text(message, state):
+        await chat_handlers.cb_chat_entry(message, state)
+
+    all_settings_texts = get_all_translations("settings_button", loc_middleware.locales)
+    @dp.message(F.text.in_(all_settings_texts))
+    async def handle_settings_text(message, user_db, state):
+        await settings_handlers.cb_main_menu_settings(message, user_db, state)
+    # -----------------------------------------------------------
+
+    @dp.startup()
+    async def on_startup():
+        # Before any update is fed in, so ids seen before a restart count.
+        await update_dedup.start()
+        startup_profiler.report()
+        # Load the Gemini SDK off the event loop while we wait for updates.
+        asyncio.get_running_loop().run_in_executor(None, get_default_backend().warm_up)
+        await job_runner.start(bot, dp.storage)
+
+    @dp.shutdown()
+    async def on_shutdown():
+        await job_runner.stop()
+        await update_dedup.stop()
+
+    return dp
@@ -6,7 +6,8 @@ from bot.middlewares.localization import _, get_all_translations
 from bot.states.app_states import AppStates
 from bot.services.gemini_service import GeminiService
 from database.db_utils import clear_chat_history
-from bot.utils.message_utils import send_safe_html
+from bot.utils.message_utils import send_safe_html, chat_action
+from bot.services.job_queue import job_runner, JobContext, RetryableJobError
 from bot.keyboards.reply import get_dynamic_reply_keyboard
 from config import SUPPORTED_LANGUAGES, SUPPORTED_PROGRAMMING_LANGUAGES
 
@@ -55,7 +56,7 @@ async def handle_back_to_chat_menu(message: Message, state: FSMContext):
     i18n = getattr(message.bot, 'i18n', {})
     await show_chat_mode_selection(message, i18n, state)
 
-@chat_router.message(AppStates.awaiting_roleplay_scenario)
+@chat_router.message(AppStates.awaiting_roleplay_scenario, flags={"throttle": "chat"})
 async def process_roleplay_scenario(message: Message, user_db: dict, state: FSMContext, bot):
     i18n = getattr(bot, 'i18n', {})
     locales = bot.loc_middleware.locales
@@ -89,14 +90,35 @@ async def process_roleplay_scenario(message: Message, user_db: dict, state: FSMC
     await state.update_data(persona=persona_prompt)
     await message.answer(_('roleplay_started', i18n), reply_markup=get_dynamic_reply_keyboard([], i18n, 'back_to_chat_modes'))
 
-@chat_router.message(F.state.in_([AppStates.in_chat, AppStates.in_roleplay]), F.text, ~Command(commands=['menu', 'reset']))
+@chat_router.message(
+    F.state.in_([AppStates.in_chat, AppStates.in_roleplay]), F.text, ~Command(commands=['menu', 'reset']),
+    flags={"throttle": "chat"}
+)
 async def process_chat_message(message: Message, state: FSMContext):
     fsm_data = await state.get_data()
-    persona = fsm_data.get('persona')
+    await job_runner.enqueue(
+        "chat", message, state, {"persona": fsm_data.get('persona')},
+        dedupe_key=f"chat:{message.chat.id}:{message.message_id}"
+    )
 
-    processing_msg = await message.answer("🤖...")
-    response_text = await gemini_service.chat_with_ai(message.from_user.id, message.text, persona=persona)
-    await processing_msg.delete()
+@job_runner.handler("chat")
+async def run_chat_reply(ctx: JobContext):
+    # Not guarded by latest_wins: every chat message gets its own reply.
+    message = ctx.message
+    if ctx.done('reply'):
+        # An earlier attempt got the answer (and saved the turn) but failed to send it.
+        response_text = ctx.result('reply')
+    else:
+        async with chat_action(message):
+            response_text = await gemini_service.chat_with_ai(
+                message.from_user.id, message.text, persona=ctx.payload.get('persona')
+            )
+        if response_text is None:
+            if not ctx.last_attempt:
+                raise RetryableJobError("chat reply failed")
+            await message.answer("An error occurred with the AI service. Please try again.")
+            return
+        await ctx.record('reply', response_text)
     await send_safe_html(message, response_text)
 
 @chat_router.message(F.state.in_([AppStates.in_chat, AppStates.in_roleplay]), Command("reset"))
@@ -1,14 +1,19 @@
 import html
-from aiogram import Router, F, Bot
-from aiogram.filters import CommandStart, Command
+import json
+from aiogram import Router, F
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 from bot.middlewares.localization import _
 from bot.keyboards.reply import get_main_reply_keyboard
 from bot.states.app_states import AppStates
 from bot.services.gemini_service import GeminiService
+from bot.services.usage_tracker import usage_tracker
+from bot.utils.metrics import collect_metrics
+from bot.utils.message_utils import chat_action
+from bot.middlewares.latest_wins import latest_wins
 from database.db_utils import increment_user_stat
-from config import SUPPORTED_LANGUAGES, SUPPORTED_PROGRAMMING_LANGUAGES
+from config import SUPPORTED_LANGUAGES, SUPPORTED_PROGRAMMING_LANGUAGES, ADMIN_USER_IDS
 
 common_router = Router()
 gemini_service = GeminiService()
@@ -58,11 +63,9 @@ async def cmd_stats(message: Message, user_db: dict):
           ) + streak_text
     )
 
-@common_router.message(Command("fact"))
-async def cmd_fact(message: Message, user_db: dict):
+@common_router.message(Command("fact"), flags={"throttle": "fact"})
+async def cmd_fact(message: Message, user_db: dict, state: FSMContext):
     i18n = getattr(message.bot, 'i18n', {})
-    processing_msg = await message.answer("🤔...")
-
     mode = user_db.get('learning_mode', 'human')
     interface_lang = SUPPORTED_LANGUAGES[user_db['interface_lang']]['gemini_name']
 
@@ -73,11 +76,48 @@ async def cmd_fact(message: Message, user_db: dict):
             user_db['programming_lang']
         ]['display_name']
 
-    fact = await gemini_service.get_fun_fact(mode, subject, interface_lang)
+    async with latest_wins.guard(message, state, "fact"), chat_action(message):
+        fact = await gemini_service.get_fun_fact(
+            mode, subject, interface_lang, user_id=message.from_user.id
+        )
 
-    await processing_msg.delete()
     if fact:
         await message.answer(_('fun_fact_text', i18n, subject=subject, fact=html.escape(fact)))
         await increment_user_stat(message.from_user.id, 'facts_requested_count')
     else:
-        await message.answer(_('generation_error', i18n))
\ No newline at end of file
+        await message.answer(_('generation_error', i18n))
+
+WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+def parse_window(text: str | None, default: int = 3600) -> int:
+    if not text or text[-1] not in WINDOW_UNITS or not text[:-1].isdigit():
+        return default
+    return int(text[:-1]) * WINDOW_UNITS[text[-1]]
+
+def format_usage_table(rows: dict) -> str:
+    lines = [f"{'key':<12}{'calls':>6}{'err':>5}{'in_tok':>9}{'out_tok':>9}{'cost$':>9}{'avg_ms':>8}{'p95_ms':>8}"]
+    for key, row in rows.items():
+        lines.append(
+            f"{str(key):<12}{row['calls']:>6}{row['errors']:>5}{row['input_tokens']:>9}"
+            f"{row['output_tokens']:>9}{row['cost_usd']:>9.4f}{row['avg_latency_ms']:>8.0f}"
+            f"{row['p95_latency_ms']:>8.0f}"
+        )
+    return html.escape("\n".join(lines))
+
+@common_router.message(Command("usage"), F.from_user.id.in_(ADMIN_USER_IDS))
+async def cmd_usage(message: Message, command: CommandObject):
+    window = parse_window(command.args)
+    per_feature = usage_tracker.aggregate(window, group_by="feature")
+    per_route = usage_tracker.aggregate(window, group_by="route")
+    top_users = dict(usage_tracker.top_users(window))
+    await message.answer(
+        f"<b>Gemini usage, last {window // 60} min</b>\n"
+        f"<pre>{format_usage_table(per_feature)}</pre>\n"
+        f"<b>Routes</b>\n<pre>{format_usage_table(per_route)}</pre>\n"
+        f"<b>Top users</b>\n<pre>{format_usage_table(top_users)}</pre>"
+    )
+
+@common_router.message(Command("metrics"), F.from_user.id.in_(ADMIN_USER_IDS))
+async def cmd_metrics(message: Message):
+    dump = json.dumps(collect_metrics(), indent=1, default=str)
+    await message.answer(f"<pre>{html.escape(dump[:3900])}</pre>")
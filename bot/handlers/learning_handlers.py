@@ -1,5 +1,4 @@
 import html
-import asyncio
 from pathlib import Path
 from aiogram import Router, F, Bot
 from aiogram.fsm.context import FSMContext
@@ -7,9 +6,11 @@ from aiogram.types import Message
 from bot.middlewares.localization import _, get_all_translations, Localization
 from bot.states.app_states import AppStates
 from bot.services.gemini_service import GeminiService
+from bot.services.answer_grader import grade_answer, known_words, CORRECT, TYPO, INCORRECT
 from bot.keyboards.reply import get_dynamic_reply_keyboard
-from database.db_utils import get_or_create_user, increment_user_stat
-from bot.utils.message_utils import send_safe_html
+from database.db_utils import increment_user_stat
+from bot.utils.message_utils import send_safe_html, chat_action
+from bot.middlewares.latest_wins import latest_wins
 from config import (
     SUPPORTED_LANGUAGES, LEARNING_LEVELS,
     SUPPORTED_PROGRAMMING_LANGUAGES, PROGRAMMING_LEVELS
@@ -48,53 +49,29 @@ async def cb_main_menu_learn(message: Message, user_db: dict, state: FSMContext)
     await state.update_data(recent_items=[])
     await show_learning_menu(message, i18n, user_db, state)
 
-def is_quiz_valid(data: dict | None) -> bool:
-    if not data: return False
-    keys = ["question", "options", "correct_answer_text"]
-    return all(k in data for k in keys) and len(data["options"]) >= 2
-
-def is_word_valid(data: dict | None) -> bool:
-    if not data: return False
-    return all(k in data for k in ["item", "translation"])
-
-def is_concept_valid(data: dict | None) -> bool:
-    if not data: return False
-    return all(k in data for k in ["item", "explanation"])
-
 async def handle_learn_activity_request(message: Message, user_db: dict, state: FSMContext, bot: Bot, activity_type: str):
     i18n = getattr(bot, 'i18n', {})
     mode = user_db.get('learning_mode', 'human')
 
-    generating_text_key = f"generating_{activity_type}"
-    processing_msg = await message.answer(_(generating_text_key, i18n))
-
-    item_data, validation_func = None, None
-    if activity_type == 'quiz': validation_func = is_quiz_valid
-    elif mode == 'human' and activity_type == 'word': validation_func = is_word_valid
-    elif mode == 'programming' and activity_type == 'concept': validation_func = is_concept_valid
-
-    for _i in range(3):
-        fsm_data = await state.get_data()
-        recent_items = fsm_data.get("recent_items", [])
-        lang_info, level = {}, ""
+    fsm_data = await state.get_data()
+    recent_items = fsm_data.get("recent_items", [])
+    lang_info, level = {}, ""
 
-        if mode == 'human':
-            lang_info['native'] = SUPPORTED_LANGUAGES[user_db['native_lang']]['gemini_name']
-            lang_info['learning'] = SUPPORTED_LANGUAGES[user_db['learning_lang']]['gemini_name']
-            level = LEARNING_LEVELS[user_db['learning_level']]
-        else:
-            lang_info['programming'] = SUPPORTED_PROGRAMMING_LANGUAGES[user_db['programming_lang']]['display_name']
-            level = PROGRAMMING_LEVELS[user_db['programming_level']]
-            lang_info['interface_lang_name'] = SUPPORTED_LANGUAGES[user_db['interface_lang']]['gemini_name']
-
-        api_response = await gemini_service.get_learning_item(activity_type, mode, lang_info, level, recent_items)
-
-        if validation_func and validation_func(api_response):
-            item_data = api_response
-            break
-        await asyncio.sleep(0.5)
+    if mode == 'human':
+        lang_info['native'] = SUPPORTED_LANGUAGES[user_db['native_lang']]['gemini_name']
+        lang_info['learning'] = SUPPORTED_LANGUAGES[user_db['learning_lang']]['gemini_name']
+        level = LEARNING_LEVELS[user_db['learning_level']]
+    else:
+        lang_info['programming'] = SUPPORTED_PROGRAMMING_LANGUAGES[user_db['programming_lang']]['display_name']
+        level = PROGRAMMING_LEVELS[user_db['programming_level']]
+        lang_info['interface_lang_name'] = SUPPORTED_LANGUAGES[user_db['interface_lang']]['gemini_name']
 
-    await processing_msg.delete()
+    # The response schema rejects malformed items; retries happen in the service.
+    async with latest_wins.guard(message, state, "learn"), chat_action(message):
+        item_data = await gemini_service.get_learning_item(
+            activity_type, mode, lang_info, level, recent_items,
+            user_id=message.from_user.id
+        )
 
     if not item_data:
         await message.answer(_('generation_error', i18n))
@@ -103,15 +80,15 @@ async def handle_learn_activity_request(message: Message, user_db: dict, state:
 
     current_state_data = await state.get_data()
     new_recent_items = current_state_data.get("recent_items", [])
-    new_item = item_data.get("item") or item_data.get("question")
+    new_item = item_data.question if activity_type == 'quiz' else item_data.item
     if new_item: new_recent_items.append(new_item)
     data_to_update = {"recent_items": new_recent_items[-15:]}
 
     if activity_type == 'quiz':
         await state.set_state(AppStates.awaiting_quiz_answer)
-        question = html.escape(item_data.get("question", ""))
-        options = [html.escape(opt) for opt in item_data.get("options", [])]
-        correct_answer_text = html.escape(item_data.get("correct_answer_text", ""))
+        question = html.escape(item_data.question)
+        options = [html.escape(opt) for opt in item_data.options]
+        correct_answer_text = html.escape(item_data.correct_answer_text)
 
         data_to_update["correct_quiz_answer"] = correct_answer_text
         question_text = _('quiz_question', i18n, question=question)
@@ -132,20 +109,21 @@ async def handle_learn_activity_request(message: Message, user_db: dict, state:
 
     elif mode == 'human' and activity_type == 'word':
         await state.set_state(AppStates.awaiting_learning_answer)
-        data_to_update["original_text"] = item_data.get("item")
+        data_to_update["original_text"] = item_data.item
+        data_to_update["expected_translation"] = item_data.translation
         data_to_update["source_lang"] = lang_info['learning']
         data_to_update["target_lang"] = lang_info['native']
         await state.update_data(**data_to_update)
         await message.answer(
-            _('learn_word_prompt', i18n, level=level, text_to_translate=html.escape(item_data.get("item", ""))) +
+            _('learn_word_prompt', i18n, level=level, text_to_translate=html.escape(item_data.item)) +
             "\n\n" + _('learn_translate_this', i18n, target_lang_name=SUPPORTED_LANGUAGES[user_db['native_lang']]['display_name']),
             reply_markup=get_dynamic_reply_keyboard([], i18n, 'back_to_learn_menu')
         )
 
     elif mode == 'programming' and activity_type == 'concept':
-        title = html.escape(item_data.get("item", ""))
-        explanation = html.escape(item_data.get("explanation", ""))
-        code = html.escape(item_data.get("code_example", ""))
+        title = html.escape(item_data.item)
+        explanation = html.escape(item_data.explanation)
+        code = html.escape(item_data.code_example)
         text = _('prog_concept_text', i18n, title=title, explanation=explanation, code=code)
         await send_safe_html(message, text, reply_markup=get_dynamic_reply_keyboard([i18n.get('next_concept')], i18n, 'back_to_learn_menu'))
         await increment_user_stat(message.from_user.id, 'words_learned_count')
@@ -160,7 +138,8 @@ async def handle_learn_activity_request(message: Message, user_db: dict, state:
         get_all_translations("new_word", all_locales) +
         get_all_translations("new_concept", all_locales) +
         get_all_translations("quiz", all_locales)
-    )
+    ),
+    flags={"throttle": "learn"}
 )
 async def process_learn_menu_choice(message: Message, user_db: dict, state: FSMContext, bot: Bot):
     mode = user_db.get('learning_mode', 'human')
@@ -187,23 +166,40 @@ async def handle_back_to_learn_menu(message: Message, user_db: dict, state: FSMC
     i18n = getattr(message.bot, 'i18n', {})
     await show_learning_menu(message, i18n, user_db, state)
 
-@learning_router.message(AppStates.awaiting_learning_answer, F.text)
+@learning_router.message(AppStates.awaiting_learning_answer, F.text, flags={"throttle": "learn"})
 async def process_learning_answer(message: Message, state: FSMContext, user_db: dict):
     i18n = getattr(message.bot, 'i18n', {})
     user_answer = message.text
     data = await state.get_data()
 
     await increment_user_stat(message.from_user.id, 'words_learned_count')
-    processing_msg = await message.answer(_('evaluating_answer', i18n))
 
-    feedback = await gemini_service.evaluate_user_answer(
-        original_text=data.get('original_text'),
-        user_translation=user_answer,
-        source_lang=data.get('source_lang'),
-        target_lang=data.get('target_lang')
+    expected = data.get('expected_translation')
+    grade = grade_answer(
+        user_answer, expected,
+        original=data.get('original_text'),
+        lang_name=data.get('target_lang'),
+        known=known_words(data.get('target_lang'))
     )
+    if grade and expected:
+        template_key = {
+            CORRECT: 'answer_correct',
+            TYPO: 'answer_typo',
+            INCORRECT: 'answer_incorrect',
+        }[grade]
+        await send_safe_html(message, _(template_key, i18n, expected=html.escape(expected)))
+        await show_learning_menu(message, i18n, user_db, state)
+        return
+
+    async with latest_wins.guard(message, state, "learn"), chat_action(message):
+        feedback = await gemini_service.evaluate_user_answer(
+            original_text=data.get('original_text'),
+            user_translation=user_answer,
+            source_lang=data.get('source_lang'),
+            target_lang=data.get('target_lang'),
+            user_id=message.from_user.id
+        )
 
-    await processing_msg.delete()
     if feedback:
         await send_safe_html(message, _('ai_feedback', i18n, feedback=feedback))
 
@@ -248,7 +244,8 @@ async def process_quiz_answer(message: Message, state: FSMContext, user_db: dict
     F.text.in_(
         get_all_translations("next_quiz", all_locales) +
         get_all_translations("next_concept", all_locales)
-    )
+    ),
+    flags={"throttle": "learn"}
 )
 async def handle_next_activity(message: Message, user_db: dict, state: FSMContext, bot: Bot):
     activity_type = 'concept' if message.text in get_all_translations("next_concept", all_locales) else 'quiz'
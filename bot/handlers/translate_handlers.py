@@ -1,17 +1,37 @@
+import asyncio
+import dataclasses
+import hashlib
 import io
 import logging
 import html
+import tempfile
+from collections import Counter
 from pathlib import Path
 from aiogram import Router, F, Bot
+from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, PhotoSize
+from aiogram.enums import ChatAction
+from aiogram.types import Message, PhotoSize, FSInputFile
 from bot.middlewares.localization import _, get_all_translations, Localization
+from bot.middlewares.media_group import MediaGroupMiddleware
 from bot.states.app_states import AppStates
 from bot.services.gemini_service import GeminiService
-from bot.services.tts_service import text_to_speech_file
+from bot.services.tts_service import synthesize_speech, TtsBusyError
+from bot.services.voice_registry import send_voice_clip
+from bot.services.tts_prefetch import speculative_tts
+from bot.services.image_pipeline import PreparedImage, prepare_image, select_photo_size
+from bot.services.image_cache import image_cache, CachedImageText
+from bot.services.document_translator import translate_file
+from bot.utils.message_utils import ProgressMessage, chat_action
+from bot.middlewares.latest_wins import latest_wins, Superseded
+from bot.services.job_queue import job_runner, JobContext, RetryableJobError, BACKGROUND
+from bot.services.gemini_schemas import ImageTextResult
 from bot.keyboards.reply import get_universal_translator_keyboard, get_dynamic_reply_keyboard, get_translation_actions_reply_keyboard
 from database.db_utils import increment_user_stat
-from config import SUPPORTED_LANGUAGES
+from config import (
+    SUPPORTED_LANGUAGES, DOC_EXTENSIONS, DOC_MAX_BYTES, DOC_PROGRESS_INTERVAL,
+    LONG_TEXT_CHARS, TTS_SPECULATIVE, TTS_SPECULATIVE_SOURCE
+)
 
 # --- ՍԿԻԶԲ։ Կոճակների ֆիլտրերի ուղղում ---
 # Ստեղծում ենք Localization-ի օրինակ՝ բոլոր թարգմանությունները բեռնելու համար
@@ -21,6 +41,7 @@ all_locales = loc_middleware.locales
 # --- ԱՎԱՐՏ։ Կոճակների ֆիլտրերի ուղղում ---
 
 translate_router = Router()
+translate_router.message.middleware(MediaGroupMiddleware())
 gemini_service = GeminiService()
 
 def find_lang_key_by_name(lang_name: str, lang_dict: dict) -> str | None:
@@ -103,12 +124,101 @@ async def process_set_target_lang(message: Message, i18n: dict, state: FSMContex
         await state.update_data(target_lang=lang_code)
         await show_translator_interface(message, i18n, state)
 
+async def translate_cached_image(
+    entry: CachedImageText, target_lang_name: str, user_id: int
+) -> ImageTextResult | None:
+    translated_text = entry.translations.get(target_lang_name)
+    if translated_text is None:
+        # Only the text needs translating; the OCR result is reused.
+        text_result = await gemini_service.translate_text(
+            entry.found_text, target_lang_name,
+            entry.detected_language_name or "auto", user_id=user_id
+        )
+        if not text_result:
+            return None
+        translated_text = entry.translations[target_lang_name] = text_result.translated_text
+        image_cache.stats["text_translations"] += 1
+    return ImageTextResult(
+        translated_text=translated_text,
+        found_text=entry.found_text,
+        detected_language_name=entry.detected_language_name
+    )
+
+async def lookup_photo(
+    bot: Bot, photos: list[PhotoSize]
+) -> tuple[CachedImageText | None, PreparedImage | None]:
+    unique_ids = [photo.file_unique_id for photo in photos]
+    cached = image_cache.get_by_unique_ids(unique_ids)
+    if cached:
+        return cached, None
+
+    photo = select_photo_size(photos)
+    image_bytes = io.BytesIO()
+    await bot.download(file=photo.file_id, destination=image_bytes)
+    image = await prepare_image(image_bytes.getvalue())
+    if not image:
+        return None, None
+    return image_cache.get_by_phash(
+        image.phash, image.width / image.height, image.thumbnail, unique_ids
+    ), image
+
+async def translate_photos(
+    bot: Bot, photo_sets: list[list[PhotoSize]], target_lang_name: str, user_id: int
+) -> list[ImageTextResult | None]:
+    # Albums are downloaded concurrently and every uncached image goes to
+    # Gemini in a single request.
+    lookups = await asyncio.gather(*(lookup_photo(bot, photos) for photos in photo_sets))
+    results: list[ImageTextResult | None] = [None] * len(photo_sets)
+
+    pending = [i for i, (cached, image) in enumerate(lookups) if not cached and image]
+    images = [lookups[i][1] for i in pending]
+    fresh = None
+    if len(images) > 1:
+        fresh = await gemini_service.get_text_from_images(images, target_lang_name, user_id=user_id)
+    if fresh is None:
+        fresh = await asyncio.gather(*(
+            gemini_service.get_text_from_image(image, target_lang_name, user_id=user_id)
+            for image in images
+        ))
+    for i, image, result in zip(pending, images, fresh):
+        results[i] = result
+        if result and result.found_text:
+            image_cache.put(
+                [photo.file_unique_id for photo in photo_sets[i]],
+                image.phash, image.width / image.height, image.thumbnail, result.found_text,
+                result.detected_language_name, target_lang_name, result.translated_text
+            )
+
+    cached_indexes = [i for i, (cached, _image) in enumerate(lookups) if cached]
+    cached_results = await asyncio.gather(*(
+        translate_cached_image(lookups[i][0], target_lang_name, user_id)
+        for i in cached_indexes
+    ))
+    for i, result in zip(cached_indexes, cached_results):
+        results[i] = result
+    return results
+
+def combine_album_results(results: list[ImageTextResult | None]) -> ImageTextResult | None:
+    found = [(number, r) for number, r in enumerate(results, start=1) if r]
+    if not found:
+        return None
+    if len(results) == 1:
+        return found[0][1]
+
+    total = len(results)
+    languages = Counter(r.detected_language_name for _n, r in found if r.detected_language_name)
+    return ImageTextResult(
+        translated_text="\n\n".join(f"[{n}/{total}]\n{r.translated_text}" for n, r in found),
+        found_text="\n\n".join(r.found_text for _n, r in found if r.found_text),
+        detected_language_name=languages.most_common(1)[0][0] if languages else ""
+    )
+
 async def perform_translation(
     message: Message, i18n: dict, state: FSMContext,
     text_to_translate: str | None = None,
-    image_bytes: io.BytesIO | None = None
+    photo_sets: list[list[PhotoSize]] | None = None,
+    job: JobContext | None = None
 ):
-    processing_msg = await message.answer(_('translating', i18n))
     data = await state.get_data()
     source_lang_code = data.get('source_lang', 'auto')
     target_lang_code = data.get('target_lang', 'en')
@@ -117,24 +227,50 @@ async def perform_translation(
     source_lang_name = "auto" if source_lang_code == 'auto' else SUPPORTED_LANGUAGES[source_lang_code]['gemini_name']
 
     result = None
-    if text_to_translate:
-        result = await gemini_service.translate_text(text_to_translate, target_lang_name, source_lang_name)
-    elif image_bytes:
-        result = await gemini_service.get_text_from_image(image_bytes, target_lang_name)
-
-    await processing_msg.delete()
+    if job and job.done('result'):
+        result = ImageTextResult(**job.result('result'))
+    else:
+        feature = "image" if photo_sets else "translate"
+        async with latest_wins.guard(message, state, feature), chat_action(message):
+            if text_to_translate:
+                result = await gemini_service.translate_text(
+                    text_to_translate, target_lang_name, source_lang_name,
+                    user_id=message.from_user.id
+                )
+            elif photo_sets:
+                result = combine_album_results(await translate_photos(
+                    message.bot, photo_sets, target_lang_name, message.from_user.id
+                ))
+        if job and result:
+            await job.record('result', dataclasses.asdict(result))
+        if job and not result and not job.last_attempt:
+            raise RetryableJobError("translation failed")
 
-    if result and result.get("translated_text"):
-        await increment_user_stat(message.from_user.id, 'translations_count')
-        original_text = text_to_translate or result.get("found_text", "")
-        translated_text = result.get("translated_text")
+    if result:
+        if not (job and job.done('counted')):
+            await increment_user_stat(message.from_user.id, 'translations_count')
+            if job:
+                await job.record('counted')
+        original_text = text_to_translate or result.found_text
+        translated_text = result.translated_text
 
-        detected_source_name = result.get("detected_language_name", source_lang_name)
+        detected_source_name = result.detected_language_name or source_lang_name
         detected_code = next(
             (code for code, names in SUPPORTED_LANGUAGES.items()
              if names['gemini_name'].lower() == detected_source_name.lower()),
             source_lang_code if source_lang_code != 'auto' else 'en'
         )
+        response_text = _('translation_result', i18n,
+            source_lang=html.escape(detected_source_name),
+            target_lang=html.escape(target_lang_name),
+            translated_text=html.escape(translated_text)
+        )
+        if job and not await job.state_unchanged():
+            # The user moved on while the job waited or ran: deliver the
+            # result, but leave their newer state and keyboard alone.
+            await message.answer(response_text)
+            return
+
         await state.update_data(
             last_source_text=original_text,
             last_translated_text=translated_text,
@@ -142,28 +278,118 @@ async def perform_translation(
             last_target_code=target_lang_code
         )
         await state.set_state(AppStates.awaiting_tts_choice)
+        if TTS_SPECULATIVE:
+            clips = [(translated_text, target_lang_code)]
+            if TTS_SPECULATIVE_SOURCE:
+                clips.append((original_text, detected_code))
+            speculative_tts.start(message.from_user.id, clips)
 
-        response_text = _('translation_result', i18n,
-            source_lang=html.escape(detected_source_name),
-            target_lang=html.escape(target_lang_name),
-            translated_text=html.escape(translated_text)
-        )
         await message.answer(response_text, reply_markup=get_translation_actions_reply_keyboard(i18n))
     else:
         await message.answer(_('translation_error', i18n))
 
-@translate_router.message(AppStates.in_translation_mode, F.text)
+async def translate_document_file(
+    message: Message, i18n: dict, state: FSMContext, source: Path, file_name: str
+):
+    data = await state.get_data()
+    source_lang_code = data.get('source_lang', 'auto')
+    target_lang_code = data.get('target_lang', 'en')
+    target_lang_name = SUPPORTED_LANGUAGES[target_lang_code]['gemini_name']
+    source_lang_name = "auto" if source_lang_code == 'auto' else SUPPORTED_LANGUAGES[source_lang_code]['gemini_name']
+
+    status_msg = await message.answer(_('doc_translating', i18n, percent=0))
+    progress = ProgressMessage(status_msg, DOC_PROGRESS_INTERVAL)
+    total_bytes = max(source.stat().st_size, 1)
+
+    async def report_progress(position: int):
+        percent = min(99, position * 100 // total_bytes)
+        await progress.update(_('doc_translating', i18n, percent=percent))
+
+    async def translate(texts: list[str]) -> list[str] | None:
+        return await gemini_service.translate_segments(
+            texts, target_lang_name, source_lang_name, user_id=message.from_user.id
+        )
+
+    result_path = source.with_name(f"{Path(file_name).stem}.{target_lang_code}{source.suffix}")
+    try:
+        async with latest_wins.guard(message, state, "document" if message.document else "translate"):
+            stats = await translate_file(source, result_path, translate, report_progress)
+    except Superseded:
+        await status_msg.delete()
+        raise
+
+    if not stats.segments or stats.failed_segments == stats.segments:
+        await progress.update(_('translation_error', i18n), force=True)
+        return
+    await status_msg.delete()
+
+    await increment_user_stat(message.from_user.id, 'translations_count')
+    caption = _('doc_translated', i18n, target_lang=html.escape(target_lang_name))
+    if stats.failed_chunks:
+        caption += "\n" + _('doc_partial', i18n, count=stats.failed_chunks)
+    await message.answer_document(FSInputFile(result_path, filename=result_path.name), caption=caption)
+
+@translate_router.message(AppStates.in_translation_mode, F.text, flags={"throttle": "translate"})
 async def process_text_translation(message: Message, state: FSMContext, i18n: dict):
-    await perform_translation(message, i18n, state, text_to_translate=message.text)
+    if len(message.text) <= LONG_TEXT_CHARS:
+        await perform_translation(message, i18n, state, text_to_translate=message.text)
+        return
+    # Too long for a single request or a single reply message.
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = Path(tmp_dir) / "message.txt"
+        source.write_text(message.text, encoding="utf-8")
+        await translate_document_file(message, i18n, state, source, source.name)
 
-@translate_router.message(AppStates.in_translation_mode, F.photo)
-async def process_image_translation(message: Message, state: FSMContext, bot: Bot, i18n: dict):
-    photo: PhotoSize = message.photo[-1]
-    image_bytes = io.BytesIO()
-    await bot.download(file=photo.file_id, destination=image_bytes)
-    await perform_translation(message, i18n, state, image_bytes=image_bytes)
+# Photos and documents also start a new translation from the TTS keyboard.
+@translate_router.message(
+    StateFilter(AppStates.in_translation_mode, AppStates.awaiting_tts_choice), F.document,
+    flags={"throttle": "translate"}
+)
+async def process_document_translation(
+    message: Message, state: FSMContext, bot: Bot, i18n: dict,
+    album: list[Message] | None = None
+):
+    for item in album or [message]:
+        document = item.document
+        if not document:
+            continue
+        file_name = document.file_name or "document.txt"
+        suffix = Path(file_name).suffix.lower()
+        if suffix not in DOC_EXTENSIONS:
+            await message.answer(_('doc_unsupported', i18n))
+            continue
+        if (document.file_size or 0) > DOC_MAX_BYTES:
+            await message.answer(_('doc_too_large', i18n, max_mb=DOC_MAX_BYTES // (1024 * 1024)))
+            continue
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = Path(tmp_dir) / f"source{suffix}"
+            await bot.download(document, destination=source)
+            await translate_document_file(message, i18n, state, source, file_name)
+
+@translate_router.message(
+    StateFilter(AppStates.in_translation_mode, AppStates.awaiting_tts_choice), F.photo,
+    flags={"throttle": "image"}
+)
+async def process_image_translation(
+    message: Message, state: FSMContext, bot: Bot, i18n: dict,
+    album: list[Message] | None = None
+):
+    photo_sets = [
+        [photo.model_dump(mode="json", exclude_none=True) for photo in m.photo]
+        for m in album or [message] if m.photo
+    ]
+    await job_runner.enqueue(
+        "image_translation", message, state, {"photo_sets": photo_sets}, priority=BACKGROUND,
+        dedupe_key=f"image:{message.chat.id}:{message.media_group_id or message.message_id}"
+    )
 
-@translate_router.message(AppStates.awaiting_tts_choice)
+@job_runner.handler("image_translation")
+async def run_image_translation(ctx: JobContext):
+    photo_sets = [[PhotoSize.model_validate(photo) for photo in photos] for photos in ctx.payload['photo_sets']]
+    await perform_translation(ctx.message, ctx.i18n, ctx.state, photo_sets=photo_sets, job=ctx)
+
+@translate_router.message(AppStates.awaiting_tts_choice, F.text, flags={"throttle": "tts"})
 async def process_tts_choice(message: Message, state: FSMContext, bot: Bot, i18n: dict):
     locales = bot.loc_middleware.locales
     choice = message.text
@@ -193,11 +419,34 @@ async def process_tts_choice(message: Message, state: FSMContext, bot: Bot, i18n
         await message.answer("Error: Text or language not found for TTS.")
         return
 
-    processing_tts_msg = await message.answer("▶️ Generating voice...")
-    audio_file = await text_to_speech_file(text, lang_code)
-    await processing_tts_msg.delete()
+    if speculative_tts.is_ready(message.from_user.id, text, lang_code):
+        await send_voice_clip(message, await speculative_tts.take(message.from_user.id, text, lang_code))
+        return
+
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+    await job_runner.enqueue(
+        "tts", message, state, {"text": text, "lang_code": lang_code, "side": action},
+        dedupe_key=f"tts:{message.from_user.id}:{lang_code}:{digest}"
+    )
+
+@job_runner.handler("tts")
+async def run_tts(ctx: JobContext):
+    message = ctx.message
+    text, lang_code = ctx.payload['text'], ctx.payload['lang_code']
+    try:
+        async with latest_wins.guard(message, ctx.state, f"tts:{ctx.payload.get('side')}"), chat_action(message, ChatAction.UPLOAD_VOICE):
+            audio = await speculative_tts.take(message.from_user.id, text, lang_code)
+            if not audio:
+                audio = await synthesize_speech(text, lang_code)
+    except TtsBusyError:
+        if not ctx.last_attempt:
+            raise
+        await message.answer(_('tts_busy', ctx.i18n))
+        return
 
-    if audio_file:
-        await message.answer_voice(audio_file)
+    if audio:
+        await send_voice_clip(message, audio)
+    elif not ctx.last_attempt:
+        raise RetryableJobError(f"no voice for '{lang_code}'")
     else:
-        await message.answer(f"Failed to generate voice for '{lang_code}'.")
\ No newline at end of file
+        await message.answer(f"Failed to generate voice for '{lang_code}'.")
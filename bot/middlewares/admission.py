@@ -0,0 +1,90 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, Message, User
+from config import ADMISSION_BUDGET, ADMISSION_WEIGHTS, ADMISSION_NOTICE_COOLDOWN
+from bot.middlewares.localization import _
+from bot.middlewares.update_classes import UpdateClassifier
+
+MAX_NOTIFIED_USERS = 10000
+
+
+class AdmissionControl(BaseMiddleware):
+    # Outer update middleware, behind ChatScheduler: an update is charged only
+    # once it has its chat's turn, so one user flooding their own chat can't
+    # use up the budget with queued updates. Every update is given a cost
+    # class from its content and FSM state (no DB access, so refusing is
+    # cheap); the summed weight running is capped, and over the cap the
+    # update is answered with a short "busy" notice instead.
+    def __init__(self, classifier: UpdateClassifier, budget: float = ADMISSION_BUDGET, weights: dict = ADMISSION_WEIGHTS):
+        self.classifier = classifier
+        self.locales = classifier.locales
+        self.budget = budget
+        self.weights = weights
+        self.in_flight = 0.0
+        self.peak = 0.0
+        self._notified: OrderedDict[int, float] = OrderedDict()
+        self.stats = {"admitted": 0, "fast_path": 0, "rejected": 0, "notices": 0}
+        self.rejected_by_class: dict[str, int] = {}
+
+    def _should_notify(self, user_id: int, now: float) -> bool:
+        last = self._notified.get(user_id)
+        if last is not None and now - last < ADMISSION_NOTICE_COOLDOWN:
+            return False
+        self._notified[user_id] = now
+        self._notified.move_to_end(user_id)
+        if len(self._notified) > MAX_NOTIFIED_USERS:
+            self._notified.popitem(last=False)
+        return True
+
+    async def _refuse(self, event: Update, data: Dict[str, Any]):
+        message: Message = event.message
+        user: User | None = data.get('event_from_user')
+        if not user or not self._should_notify(user.id, time.monotonic()):
+            return
+        # The user's settings are in the DB, which we don't touch here; the
+        # Telegram client language is a good enough guess for one line.
+        lang = (user.language_code or "en").split("-")[0]
+        i18n = self.locales.get(lang) or self.locales.get("en", {})
+        self.stats["notices"] += 1
+        try:
+            await message.answer(_('overloaded', i18n))
+        except Exception as e:
+            logging.warning(f"Could not send overload notice to {user.id}: {e}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        cost_class = self.classifier.classify(event, data)
+        weight = self.weights.get(cost_class, 1)
+        if not weight:
+            self.stats["fast_path"] += 1
+            return await handler(event, data)
+        if self.in_flight + weight > self.budget:
+            self.stats["rejected"] += 1
+            self.rejected_by_class[cost_class] = self.rejected_by_class.get(cost_class, 0) + 1
+            await self._refuse(event, data)
+            return None
+
+        self.in_flight += weight
+        self.peak = max(self.peak, self.in_flight)
+        self.stats["admitted"] += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= weight
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "budget": self.budget,
+            "in_flight_weight": self.in_flight,
+            "load": round(self.in_flight / self.budget, 3) if self.budget else 0.0,
+            "peak_weight": self.peak,
+            "rejected_by_class": dict(self.rejected_by_class),
+        }
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, Chat, User
+from config import SCHEDULER_MAX_WORKERS
+from bot.services.usage_tracker import percentile
+
+class _ChatQueue:
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        # asyncio.Lock wakes waiters in FIFO order, which keeps updates of a
+        # chat in arrival order.
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+class ChatScheduler(BaseMiddleware):
+    # Outer update middleware: updates of one chat run one at a time and in
+    # order, different chats run in parallel up to `max_workers` handlers.
+    def __init__(self, max_workers: int = SCHEDULER_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._queues: dict[int, _ChatQueue] = {}
+        self._slots: asyncio.Semaphore | None = None
+        self._waits = deque(maxlen=2000)
+        self.running = 0
+        self.waiting_for_worker = 0
+        self.stats = {"scheduled": 0, "queued_behind_chat": 0, "evicted_queues": 0, "max_chat_depth": 0}
+
+    @staticmethod
+    def chat_key(event: TelegramObject, data: Dict[str, Any]) -> int | None:
+        # Album items wait for each other in MediaGroupMiddleware, so they must
+        # not be serialized behind the first one.
+        if isinstance(event, Update) and event.message and event.message.media_group_id:
+            return None
+        chat: Chat | None = data.get('event_chat')
+        if chat:
+            return chat.id
+        user: User | None = data.get('event_from_user')
+        return user.id if user else None
+
+    async def _run(self, handler, event, data, arrived: float):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        self.waiting_for_worker += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting_for_worker -= 1
+        self._waits.append(time.perf_counter() - arrived)
+        self.running += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        arrived = time.perf_counter()
+        self.stats["scheduled"] += 1
+        key = self.chat_key(event, data)
+        if key is None:
+            return await self._run(handler, event, data, arrived)
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _ChatQueue()
+        queue.depth += 1
+        if queue.depth > 1:
+            self.stats["queued_behind_chat"] += 1
+            self.stats["max_chat_depth"] = max(self.stats["max_chat_depth"], queue.depth)
+        waited = queue.lock.locked()
+        try:
+            async with queue.lock:
+                if waited and 'state' in data:
+                    # aiogram resolved the FSM state on arrival; the updates
+                    # ahead of this one may have changed it since.
+                    data['raw_state'] = await data['state'].get_state()
+                return await self._run(handler, event, data, arrived)
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0 and self._queues.get(key) is queue:
+                # Nothing left for this chat: drop its queue right away.
+                del self._queues[key]
+                self.stats["evicted_queues"] += 1
+
+    def snapshot(self) -> dict:
+        depths = [queue.depth for queue in self._queues.values()]
+        waits = sorted(w * 1000 for w in self._waits)
+        return {
+            **self.stats,
+            "max_workers": self.max_workers,
+            "running": self.running,
+            "active_chats": len(depths),
+            "queued_in_chats": sum(depth - 1 for depth in depths),
+            "waiting_for_worker": self.waiting_for_worker,
+            "deepest_chat_queue": max(depths, default=0),
+            "p50_wait_ms": round(percentile(waits, 0.5), 2) if waits else 0.0,
+            "p95_wait_ms": round(percentile(waits, 0.95), 2) if waits else 0.0,
+        }
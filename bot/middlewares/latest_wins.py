@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject, Update, Message
+from bot.middlewares.update_classes import UpdateClassifier
+from bot.utils.metrics import register_metrics
+
+
+class Superseded(Exception):
+    pass
+
+
+@dataclass
+class _InFlight:
+    task: asyncio.Task
+    chat_id: int
+    state: str | None
+    media_group_id: str | None
+    superseded: bool = False
+
+
+class LatestWins(BaseMiddleware):
+    # Handlers wrap their upstream call in `guard()`. When a newer message of
+    # the same user arrives in the same chat and FSM state and asks for the
+    # same feature (i.e. the same handler is about to run again), the guarded
+    # call is cancelled right away instead of finishing an answer nobody
+    # wants. Menu navigation never cancels anything.
+    #
+    # Registered as an outer update middleware ahead of ChatScheduler: the new
+    # update would otherwise wait behind the old one for the chat lock. It
+    # never awaits before passing the update on, so arrival order is kept.
+    def __init__(self, classifier: UpdateClassifier | None = None):
+        # Set by create_dispatcher(); without one nothing is preempted.
+        self.classifier = classifier
+        self._in_flight: dict[tuple[int, str], _InFlight] = {}
+        self.stats = {"guarded": 0, "superseded": 0, "completed": 0}
+
+    def _cancel(self, key: tuple[int, str], entry: _InFlight):
+        if not entry.superseded and not entry.task.done():
+            entry.superseded = True
+            entry.task.cancel()
+            self.stats["superseded"] += 1
+            logging.info(f"Cancelled superseded {key[1]} request of user {key[0]}")
+
+    @asynccontextmanager
+    async def guard(self, message: Message, state: FSMContext, feature: str):
+        key = (message.from_user.id, feature)
+        entry = _InFlight(
+            task=asyncio.current_task(),
+            chat_id=message.chat.id,
+            state=await state.get_state(),
+            media_group_id=message.media_group_id,
+        )
+        previous = self._in_flight.get(key)
+        if previous:
+            # Same feature from another chat, which preemption doesn't see.
+            self._cancel(key, previous)
+        self._in_flight[key] = entry
+        self.stats["guarded"] += 1
+        try:
+            yield
+        except asyncio.CancelledError:
+            if not entry.superseded:
+                raise
+            if hasattr(entry.task, "uncancel"):
+                entry.task.uncancel()
+            raise Superseded(feature)
+        finally:
+            if self._in_flight.get(key) is entry:
+                del self._in_flight[key]
+        self.stats["completed"] += 1
+
+    def preempt(self, event: TelegramObject, data: Dict[str, Any]):
+        message = event.message if isinstance(event, Update) else None
+        if not message or not message.from_user or self.classifier is None:
+            return
+        feature = self.classifier.classify(event, data)
+        if feature == "tts":
+            # The source and the target clip are separate requests.
+            feature = f"tts:{self.classifier.tts_sides[message.text]}"
+        key = (message.from_user.id, feature)
+        entry = self._in_flight.get(key)
+        if not entry or entry.chat_id != message.chat.id:
+            return
+        if message.media_group_id and message.media_group_id == entry.media_group_id:
+            return
+        # raw_state is loaded by aiogram's FSM middleware, which runs first.
+        if entry.state == data.get('raw_state'):
+            self._cancel(key, entry)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.preempt(event, data)
+        try:
+            return await handler(event, data)
+        except Superseded:
+            return None
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": len(self._in_flight)}
+
+
+latest_wins = LatestWins()
+register_metrics("latest_wins", latest_wins.snapshot)
@@ -1,24 +1,37 @@
 import json
 import logging
+from functools import lru_cache
 from pathlib import Path
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, User
 from database.db_utils import get_or_create_user
 
+@lru_cache(maxsize=None)
+def load_locales(locales_dir: Path) -> dict:
+    # Parsed once per process; every Localization instance shares the result.
+    locales = {}
+    for file in locales_dir.iterdir():
+        if file.suffix == ".json":
+            lang_code = file.stem
+            with open(file, 'r', encoding='utf-8') as f:
+                locales[lang_code] = json.load(f)
+    return locales
+
 class Localization(BaseMiddleware):
     def __init__(self, locales_dir: Path):
-        self.locales = {}
-        for file in locales_dir.iterdir():
-            if file.suffix == ".json":
-                lang_code = file.stem
-                with open(file, 'r', encoding='utf-8') as f:
-                    self.locales[lang_code] = json.load(f)
+        self.locales = load_locales(locales_dir.resolve())
 
         self.default_lang_texts = self.locales.get('en', {})
         if not self.default_lang_texts:
             logging.error("Default locale 'en.json' not found or is empty!")
 
+    def texts_for(self, lang_code: str) -> dict:
+        # English fills in keys a locale doesn't have yet.
+        merged_texts = self.default_lang_texts.copy()
+        merged_texts.update(self.locales.get(lang_code, self.default_lang_texts))
+        return merged_texts
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -31,13 +44,7 @@ class Localization(BaseMiddleware):
             return await handler(event, data)
 
         user_db_data = await get_or_create_user(user.id)
-        lang_code = user_db_data.get('interface_lang', 'en')
-
-        current_lang_texts = self.locales.get(
-            lang_code, self.default_lang_texts
-        )
-        merged_texts = self.default_lang_texts.copy()
-        merged_texts.update(current_lang_texts)
+        merged_texts = self.texts_for(user_db_data.get('interface_lang', 'en'))
 
         data['i18n'] = merged_texts
         data['user_db'] = user_db_data
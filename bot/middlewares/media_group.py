@@ -0,0 +1,46 @@
+import asyncio
+import time
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message
+from config import MEDIA_GROUP_WINDOW, MEDIA_GROUP_MAX_WAIT
+
+class MediaGroupMiddleware(BaseMiddleware):
+    # Telegram delivers every photo of an album as its own update. The first
+    # message of a group waits for the rest and reaches the handler with all of
+    # them in data['album']; the others are swallowed here.
+    def __init__(self, window: float = MEDIA_GROUP_WINDOW, max_wait: float = MEDIA_GROUP_MAX_WAIT):
+        self.window = window
+        self.max_wait = max_wait
+        self._groups: dict[tuple[int, str], dict] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Message) or not event.media_group_id:
+            return await handler(event, data)
+
+        key = (event.chat.id, event.media_group_id)
+        group = self._groups.get(key)
+        if group is not None:
+            group["messages"].append(event)
+            group["last_seen"] = time.monotonic()
+            return None
+
+        started = time.monotonic()
+        group = self._groups[key] = {"messages": [event], "last_seen": started}
+        try:
+            while True:
+                now = time.monotonic()
+                deadline = min(group["last_seen"] + self.window, started + self.max_wait)
+                if now >= deadline:
+                    break
+                await asyncio.sleep(deadline - now)
+        finally:
+            del self._groups[key]
+
+        data['album'] = sorted(group["messages"], key=lambda m: m.message_id)
+        return await handler(event, data)
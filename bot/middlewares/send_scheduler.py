@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from config import (
+    SEND_GLOBAL_RATE, SEND_GLOBAL_BURST, SEND_CHAT_RATE, SEND_CHAT_BURST,
+    SEND_GROUP_RATE, SEND_GROUP_BURST, SEND_MAX_RETRIES, SEND_MAX_RETRY_AFTER, BOT_WORKERS
+)
+from bot.utils.rate_limit import TokenBucket
+from bot.utils.metrics import register_metrics
+from bot.services.usage_tracker import percentile
+
+INTERACTIVE = 0
+BULK = 1
+
+_send_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+# Methods that count against Telegram's message limits. Reads, callback
+# answers and chat actions pass straight through.
+_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+_UNLIMITED = {"sendChatAction"}
+
+MAX_TRACKED_CHATS = 10000
+
+
+@contextmanager
+def bulk_sends():
+    # Sends made inside this block yield to interactive replies.
+    token = _send_priority.set(BULK)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class SendScheduler(BaseRequestMiddleware):
+    # Bot session middleware: paces outgoing messages per chat and globally,
+    # and retries requests Telegram rejected with retry_after.
+    def __init__(self):
+        # Telegram's overall limit is per bot, so with BOT_WORKERS processes
+        # each one gets its share. A private chat is handled by one worker
+        # only (updates are sharded by user), so chat buckets aren't split.
+        workers = max(BOT_WORKERS, 1)
+        self.global_bucket = TokenBucket(SEND_GLOBAL_RATE / workers, max(SEND_GLOBAL_BURST / workers, 1))
+        self._chats: OrderedDict[int, TokenBucket] = OrderedDict()
+        self._waits = deque(maxlen=2000)
+        self.waiting = {INTERACTIVE: 0, BULK: 0}
+        self._interactive_at_gate = 0
+        self.stats = {"sent": 0, "passthrough": 0, "delayed": 0, "retry_after": 0, "gave_up": 0}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Negative ids are groups and channels, which have a much lower limit.
+            if chat_id < 0:
+                bucket = TokenBucket(SEND_GROUP_RATE, SEND_GROUP_BURST)
+            else:
+                bucket = TokenBucket(SEND_CHAT_RATE, SEND_CHAT_BURST)
+            self._chats[chat_id] = bucket
+            if len(self._chats) > MAX_TRACKED_CHATS:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def _acquire_global(self, priority: int):
+        if priority == INTERACTIVE:
+            self._interactive_at_gate += 1
+            try:
+                await self.global_bucket.acquire()
+            finally:
+                self._interactive_at_gate -= 1
+            return
+        # Bulk sends only take a token when no interactive reply is waiting.
+        while self._interactive_at_gate or not self.global_bucket.try_acquire():
+            await asyncio.sleep(max(self.global_bucket.delay(), 0.01))
+
+    async def _wait_turn(self, chat_id, priority: int):
+        started = time.monotonic()
+        self.waiting[priority] += 1
+        try:
+            if isinstance(chat_id, int):
+                await self._chat_bucket(chat_id).acquire()
+            await self._acquire_global(priority)
+        finally:
+            self.waiting[priority] -= 1
+        waited = time.monotonic() - started
+        self._waits.append(waited)
+        if waited > 0.001:
+            self.stats["delayed"] += 1
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        if name in _UNLIMITED or not name.startswith(_LIMITED_PREFIXES):
+            self.stats["passthrough"] += 1
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        priority = _send_priority.get()
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            await self._wait_turn(chat_id, priority)
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.stats["retry_after"] += 1
+                if attempt == SEND_MAX_RETRIES or e.retry_after > SEND_MAX_RETRY_AFTER:
+                    self.stats["gave_up"] += 1
+                    raise
+                logging.warning(f"{name} to chat {chat_id} hit flood control, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+                continue
+            self.stats["sent"] += 1
+            return response
+
+    def snapshot(self) -> dict:
+        waits = sorted(w * 1000 for w in self._waits)
+        return {
+            **self.stats,
+            "waiting_interactive": self.waiting[INTERACTIVE],
+            "waiting_bulk": self.waiting[BULK],
+            "tracked_chats": len(self._chats),
+            "global_bucket": self.global_bucket.snapshot(),
+            "p50_wait_ms": round(percentile(waits, 0.5), 2) if waits else 0.0,
+            "p95_wait_ms": round(percentile(waits, 0.95), 2) if waits else 0.0,
+        }
+
+
+send_scheduler = SendScheduler()
+register_metrics("send_scheduler", send_scheduler.snapshot)
@@ -0,0 +1,22 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+from bot.states.app_states import AppStates
+from bot.services.tts_prefetch import speculative_tts
+
+class SpeculativeTtsMiddleware(BaseMiddleware):
+    # Drops a user's pre-synthesized clips as soon as a handler takes them out
+    # of the TTS choice menu.
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        result = await handler(event, data)
+        user: User | None = data.get('event_from_user')
+        state = data.get('state')
+        if user and state and speculative_tts.has(user.id):
+            if await state.get_state() != AppStates.awaiting_tts_choice.state:
+                speculative_tts.cancel(user.id)
+        return result
@@ -0,0 +1,104 @@
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject, Message, User
+from config import THROTTLE_LIMITS, THROTTLE_MAX_USERS
+from bot.middlewares.localization import _
+
+OVERALL = "any"
+
+
+class _UserWindows:
+    __slots__ = ("hits", "last_seen", "warned_until", "media_group_id")
+
+    def __init__(self):
+        self.hits: dict[str, deque] = {}
+        self.last_seen = 0.0
+        self.warned_until = 0.0
+        self.media_group_id = None
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    # Inner message middleware for handlers flagged with
+    # flags={"throttle": "<feature>"}. Each user gets a sliding window per
+    # feature plus one over all features; over the limit the request is
+    # dropped, and the user is told to slow down once per window.
+    def __init__(self, limits: dict = THROTTLE_LIMITS, max_users: int = THROTTLE_MAX_USERS):
+        self.limits = {feature: (int(count), float(window)) for feature, (count, window) in limits.items()}
+        self.max_users = max_users
+        self.idle_after = max((window for _count, window in self.limits.values()), default=60.0)
+        self._users: OrderedDict[int, _UserWindows] = OrderedDict()
+        self.stats = {"allowed": 0, "throttled": 0, "warned": 0, "evicted_users": 0}
+
+    def _user(self, user_id: int, now: float) -> _UserWindows:
+        windows = self._users.pop(user_id, None) or _UserWindows()
+        windows.last_seen = now
+        self._users[user_id] = windows
+        # Least recently seen first: drop users whose windows have all expired,
+        # and the oldest ones beyond the cap.
+        while self._users:
+            oldest_id, oldest = next(iter(self._users.items()))
+            if oldest is windows:
+                break
+            if len(self._users) <= self.max_users and now - oldest.last_seen < self.idle_after:
+                break
+            del self._users[oldest_id]
+            self.stats["evicted_users"] += 1
+        return windows
+
+    def _retry_in(self, windows: _UserWindows, features: list[str], now: float) -> float:
+        # Seconds until every window involved has room again; 0 if it has now.
+        wait = 0.0
+        for feature in features:
+            count, window = self.limits[feature]
+            hits = windows.hits.setdefault(feature, deque())
+            while hits and now - hits[0] >= window:
+                hits.popleft()
+            if len(hits) >= count:
+                wait = max(wait, window - (now - hits[0]))
+        return wait
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        feature = get_flag(data, "throttle")
+        user: User | None = data.get('event_from_user')
+        if not feature or not user or feature not in self.limits:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        windows = self._user(user.id, now)
+        group_id = event.media_group_id if isinstance(event, Message) else None
+        if group_id and group_id == windows.media_group_id:
+            # The rest of an album counts as the same request.
+            return await handler(event, data)
+
+        features = [feature] + ([OVERALL] if OVERALL in self.limits else [])
+        retry_in = self._retry_in(windows, features, now)
+        if retry_in:
+            self.stats["throttled"] += 1
+            if now >= windows.warned_until and isinstance(event, Message):
+                windows.warned_until = now + retry_in
+                self.stats["warned"] += 1
+                i18n = data.get('i18n', {})
+                try:
+                    await event.answer(_('throttled', i18n, seconds=math.ceil(retry_in)))
+                except Exception as e:
+                    logging.warning(f"Could not send throttle notice to {user.id}: {e}")
+            return None
+
+        for name in features:
+            windows.hits[name].append(now)
+        windows.media_group_id = group_id
+        self.stats["allowed"] += 1
+        return await handler(event, data)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "tracked_users": len(self._users), "limits": self.limits}
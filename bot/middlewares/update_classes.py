@@ -0,0 +1,62 @@
+from pathlib import Path
+from typing import Dict, Any
+from aiogram.types import TelegramObject, Update
+from bot.middlewares.localization import load_locales, get_all_translations
+from bot.states.app_states import AppStates
+
+NAV_BUTTONS = (
+    "settings_button", "translate_button", "learn_button", "chat_button",
+    "back_to_main_menu", "back_to_settings_menu", "back_to_translator",
+    "back_to_learn_menu", "back_to_chat_modes",
+    "translator_change_source", "translator_change_target", "translator_swap",
+)
+LEARN_BUTTONS = ("new_word", "new_concept", "quiz", "next_quiz", "next_concept")
+TTS_BUTTONS = ("tts_source", "tts_target")
+
+CHAT_STATES = {AppStates.in_chat.state, AppStates.in_roleplay.state, AppStates.awaiting_roleplay_scenario.state}
+
+
+class UpdateClassifier:
+    # Tells from an update's content and FSM state, without touching the DB,
+    # what kind of work it asks for: "nav" (menus, cheap), or the feature
+    # that will do the work ("translate", "image", "document", "tts",
+    # "learn", "chat", "fact"). Shared by admission control and LatestWins.
+    def __init__(self, locales_dir: Path):
+        self.locales = load_locales(locales_dir.resolve())
+        self.nav_texts = set(self._texts(NAV_BUTTONS))
+        self.learn_texts = set(self._texts(LEARN_BUTTONS))
+        # Button text -> "source" / "target".
+        self.tts_sides = {
+            text: key.removeprefix("tts_") for key in TTS_BUTTONS
+            for text in get_all_translations(key, self.locales)
+        }
+
+    def _texts(self, keys) -> list[str]:
+        return [text for key in keys for text in get_all_translations(key, self.locales)]
+
+    def classify(self, event: TelegramObject, data: Dict[str, Any]) -> str:
+        message = event.message if isinstance(event, Update) else None
+        if not message:
+            return "nav"
+        if message.photo:
+            return "image"
+        if message.document:
+            return "document"
+        text = message.text or ""
+        if text.startswith("/"):
+            return "fact" if text.split()[0].split("@")[0] == "/fact" else "nav"
+        if not text or text in self.nav_texts:
+            return "nav"
+
+        state = data.get('raw_state')
+        if state == AppStates.in_translation_mode.state:
+            return "translate"
+        if state == AppStates.awaiting_tts_choice.state:
+            return "tts" if text in self.tts_sides else "translate"
+        if state == AppStates.in_learning_menu.state:
+            return "learn" if text in self.learn_texts else "nav"
+        if state == AppStates.awaiting_learning_answer.state:
+            return "learn"
+        if state in CHAT_STATES:
+            return "chat"
+        return "nav"
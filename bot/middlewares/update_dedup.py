@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from config import UPDATE_DEDUP_WINDOW, UPDATE_DEDUP_MAX, UPDATE_DEDUP_FLUSH_INTERVAL
+from database.db_utils import load_seen_updates, save_seen_updates, prune_seen_updates
+from bot.utils.metrics import register_metrics
+
+PRUNE_INTERVAL = 60
+
+
+class UpdateDedup(BaseMiddleware):
+    # First outer update middleware: an update_id seen within the window is
+    # dropped before anything else runs. The check is a dict lookup with no
+    # await, so update order is kept for ChatScheduler; the ids are loaded
+    # from SQLite on startup and written back in batches by a background task,
+    # which also deletes the expired ones once a minute.
+    #
+    # An id counts as seen when its update comes in, not when it has been
+    # handled, so an update whose handler failed isn't run again either.
+    def __init__(
+        self, window: float = UPDATE_DEDUP_WINDOW, max_size: int = UPDATE_DEDUP_MAX,
+        flush_interval: float = UPDATE_DEDUP_FLUSH_INTERVAL
+    ):
+        self.window = window
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        # Oldest first, which is also arrival order.
+        self._seen: OrderedDict[int, float] = OrderedDict()
+        self._pending: list[tuple[int, float]] = []
+        self._flush_task: asyncio.Task | None = None
+        self.stats = {"passed": 0, "duplicates": 0, "loaded": 0, "persisted": 0, "expired": 0, "pruned": 0}
+
+    def _expire(self, now: float):
+        while self._seen:
+            update_id, seen_at = next(iter(self._seen.items()))
+            if len(self._seen) <= self.max_size and now - seen_at < self.window:
+                break
+            del self._seen[update_id]
+            self.stats["expired"] += 1
+
+    async def start(self):
+        try:
+            rows = await load_seen_updates(time.time() - self.window, self.max_size)
+        except Exception as e:
+            logging.error(f"Could not load seen update ids: {e}")
+            rows = []
+        for update_id, seen_at in rows:
+            self._seen.setdefault(update_id, seen_at)
+        self.stats["loaded"] += len(rows)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            await save_seen_updates(rows)
+        except Exception as e:
+            logging.error(f"Could not save {len(rows)} seen update ids: {e}")
+            self._pending = (rows + self._pending)[-self.max_size:]
+            return
+        self.stats["persisted"] += len(rows)
+
+    async def _flush_loop(self):
+        pruned_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                pruned_at = time.monotonic()
+                try:
+                    self.stats["pruned"] += await prune_seen_updates(time.time() - self.window)
+                except Exception as e:
+                    logging.error(f"Could not prune seen update ids: {e}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        if event.update_id in self._seen:
+            self.stats["duplicates"] += 1
+            logging.info(f"Dropped duplicate update {event.update_id}")
+            return None
+
+        now = time.time()
+        self._seen[event.update_id] = now
+        self._pending.append((event.update_id, now))
+        self._expire(now)
+        self.stats["passed"] += 1
+        return await handler(event, data)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "tracked": len(self._seen), "unsaved": len(self._pending)}
+
+
+update_dedup = UpdateDedup()
+register_metrics("update_dedup", update_dedup.snapshot)
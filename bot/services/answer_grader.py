@@ -0,0 +1,146 @@
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from config import ANSWER_WORDLISTS_DIR
+
+CORRECT = "correct"
+TYPO = "typo"
+INCORRECT = "incorrect"
+
+# Leading articles/particles that don't change whether a translation is right.
+# Keyed by the `gemini_name` from config.SUPPORTED_LANGUAGES.
+ARTICLES = {
+    "English": {"the", "a", "an", "to"},
+    "Spanish": {"el", "la", "los", "las", "un", "una", "unos", "unas"},
+    "French": {"le", "la", "les", "l", "un", "une", "des", "du", "de"},
+    "German": {
+        "der", "die", "das", "den", "dem", "des",
+        "ein", "eine", "einen", "einem", "einer", "eines"
+    },
+    "Italian": {
+        "il", "lo", "la", "i", "gli", "le", "l",
+        "un", "uno", "una"
+    },
+    "Portuguese": {"o", "a", "os", "as", "um", "uma", "uns", "umas"},
+}
+
+_ALTERNATIVES_SPLIT = re.compile(r"[,;/|]|\bor\b")
+_PARENTHESES = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+_FOLDED_SCRIPTS = ("LATIN", "GREEK", "CYRILLIC")
+
+
+def _folds_marks(base: str | None) -> bool:
+    # Accents on these scripts are commonly left out when typing; elsewhere
+    # (Devanagari vowel signs, kana voicing marks) they change the word.
+    return bool(base) and unicodedata.name(base, "").startswith(_FOLDED_SCRIPTS)
+
+
+def normalize_answer(text: str, lang_name: str | None = None, fold_marks: bool = True) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    chars = []
+    base = None
+    for ch in text:
+        category = unicodedata.category(ch)
+        if category == "Mn":
+            if not (fold_marks and _folds_marks(base)):
+                chars.append(ch)
+            continue
+        base = ch
+        chars.append(" " if category[0] in "PS" else ch)
+    words = unicodedata.normalize("NFC", "".join(chars)).split()
+
+    articles = ARTICLES.get(lang_name or "", set())
+    while len(words) > 1 and words[0] in articles:
+        words.pop(0)
+    return " ".join(words)
+
+
+def expected_variants(expected: str, lang_name: str | None = None, fold_marks: bool = True) -> set[str]:
+    variants = set()
+    for raw in (expected, _PARENTHESES.sub(" ", expected)):
+        for part in _ALTERNATIVES_SPLIT.split(raw):
+            normalized = normalize_answer(part, lang_name, fold_marks)
+            if normalized:
+                variants.add(normalized)
+    return variants
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # Optimal string alignment distance (typos and swapped letters) with an
+    # early exit once every path exceeds `limit`.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            )
+            if before and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def typo_budget(length: int) -> int:
+    if length <= 3:
+        return 0
+    if length <= 7:
+        return 1
+    return 2
+
+
+@lru_cache(maxsize=None)
+def known_words(lang_name: str | None) -> frozenset[str]:
+    # Optional word list per language, one word per line, e.g.
+    # wordlists/english.txt. Loaded once; without a list near misses are left
+    # to Gemini.
+    if not lang_name:
+        return frozenset()
+    path = Path(ANSWER_WORDLISTS_DIR) / f"{lang_name.lower()}.txt"
+    try:
+        with open(path, encoding="utf-8") as f:
+            return frozenset(filter(None, (normalize_answer(line, lang_name) for line in f)))
+    except FileNotFoundError:
+        return frozenset()
+    except OSError as e:
+        logging.error(f"Could not load word list {path}: {e}")
+        return frozenset()
+
+
+def grade_answer(
+    user_answer: str, expected: str | None, original: str | None = None,
+    lang_name: str | None = None, known: frozenset[str] | set[str] = frozenset()
+) -> str | None:
+    # Clear-cut answers get a verdict; None means the answer still needs
+    # a real evaluation (a dissimilar answer may well be a valid synonym).
+    if not normalize_answer(user_answer or "", lang_name):
+        return INCORRECT
+    if expected and normalize_answer(user_answer, lang_name, fold_marks=False) in expected_variants(
+        expected, lang_name, fold_marks=False
+    ):
+        return CORRECT
+
+    # From here on accents are ignored: "ano" for "año" is only a typo.
+    answer = normalize_answer(user_answer, lang_name)
+    variants = expected_variants(expected, lang_name) if expected else set()
+    if answer in variants:
+        return TYPO
+    if original and answer == normalize_answer(original):
+        return INCORRECT
+    if not known:
+        # Without a word list "horse" for "house" looks like a slip too.
+        return None
+    for variant in variants:
+        budget = typo_budget(len(variant))
+        if budget and edit_distance(answer, variant, budget) <= budget:
+            return INCORRECT if answer in known else TYPO
+    return None
@@ -0,0 +1,192 @@
+import asyncio
+import re
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Iterator, TextIO
+
+from config import DOC_CHUNK_TOKENS, DOC_CONCURRENCY
+from bot.utils.text_utils import split_sentences
+
+SRT_TIMING = re.compile(r"^\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}\s*-->\s*\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}")
+
+TranslateFn = Callable[[list[str]], Awaitable[list[str] | None]]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Segment:
+    # Only `text` is sent for translation; prefix and suffix are copied
+    # verbatim (SRT numbers and timestamps, blank lines, code fences).
+    text: str
+    prefix: str = ""
+    suffix: str = ""
+    offset: int = 0
+
+    def render(self, translated: str | None = None) -> str:
+        return self.prefix + (self.text if translated is None else translated) + self.suffix
+
+
+@dataclass
+class DocumentStats:
+    chunks: int = 0
+    failed_chunks: int = 0
+    segments: int = 0
+    failed_segments: int = 0
+
+
+class LineReader:
+    # Iterates lines while tracking how many bytes have been consumed.
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self.position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = next(self._lines)
+        self.position += len(line.encode("utf-8"))
+        return line
+
+
+def _text_segment(text: str, offset: int) -> Segment:
+    body = text.strip()
+    if not body:
+        return Segment("", prefix=text, offset=offset)
+    start = text.index(body)
+    return Segment(body, prefix=text[:start], suffix=text[start + len(body):], offset=offset)
+
+
+def _split_long(text: str, max_chars: int, offset: int) -> Iterator[Segment]:
+    for piece in split_sentences(text, max_chars):
+        yield _text_segment(piece, offset)
+
+
+def iter_text_segments(reader: LineReader, max_chars: int, markdown: bool = False) -> Iterator[Segment]:
+    # Paragraphs are translated as a unit; they are flushed early once they
+    # reach max_chars so files without blank lines still stream.
+    paragraph, size = [], 0
+    in_fence = False
+    for line in reader:
+        is_fence = markdown and line.lstrip().startswith(("```", "~~~"))
+        if in_fence or is_fence or not line.strip():
+            if paragraph:
+                yield from _split_long("".join(paragraph), max_chars, reader.position)
+                paragraph, size = [], 0
+            if is_fence:
+                in_fence = not in_fence
+            yield Segment("", prefix=line, offset=reader.position)
+            continue
+        paragraph.append(line)
+        size += len(line)
+        if size >= max_chars:
+            yield from _split_long("".join(paragraph), max_chars, reader.position)
+            paragraph, size = [], 0
+    if paragraph:
+        yield from _split_long("".join(paragraph), max_chars, reader.position)
+
+
+def _srt_cue(block: list[str], offset: int) -> Segment:
+    timing = next((i for i, line in enumerate(block) if SRT_TIMING.match(line.strip())), None)
+    if timing is None:
+        return _text_segment("".join(block), offset)
+    head = "".join(block[:timing + 1])
+    body = "".join(block[timing + 1:])
+    text = body.rstrip()
+    return Segment(text, prefix=head, suffix=body[len(text):], offset=offset)
+
+
+def iter_srt_segments(reader: LineReader, max_chars: int) -> Iterator[Segment]:
+    # One segment per cue: the index and timing lines stay untouched.
+    block, size = [], 0
+    for line in reader:
+        if line.strip():
+            block.append(line)
+            size += len(line)
+            if size < max_chars:
+                continue
+        if block:
+            yield _srt_cue(block, reader.position)
+            block, size = [], 0
+        if not line.strip():
+            yield Segment("", prefix=line, offset=reader.position)
+    if block:
+        yield _srt_cue(block, reader.position)
+
+
+def iter_segments(reader: LineReader, kind: str, max_chars: int) -> Iterator[Segment]:
+    if kind == ".srt":
+        return iter_srt_segments(reader, max_chars)
+    return iter_text_segments(reader, max_chars, markdown=kind == ".md")
+
+
+def iter_chunks(segments: Iterable[Segment], max_tokens: int) -> Iterator[list[Segment]]:
+    chunk, tokens = [], 0
+    for segment in segments:
+        cost = estimate_tokens(segment.text) if segment.text else 0
+        if cost and tokens and tokens + cost > max_tokens:
+            yield chunk
+            chunk, tokens = [], 0
+        chunk.append(segment)
+        tokens += cost
+    if chunk:
+        yield chunk
+
+
+async def _ordered(chunks: Iterable[list[Segment]], translate: TranslateFn, concurrency: int) -> AsyncIterator:
+    # At most `concurrency` chunks are in flight and results are yielded in
+    # input order, so memory stays bounded by the window, not the file size.
+    async def run(chunk):
+        texts = [segment.text for segment in chunk if segment.text]
+        return await translate(texts) if texts else []
+
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append((chunk, asyncio.create_task(run(chunk))))
+            if len(pending) >= concurrency:
+                chunk, task = pending.popleft()
+                yield chunk, await task
+        while pending:
+            chunk, task = pending.popleft()
+            yield chunk, await task
+    finally:
+        for _chunk, task in pending:
+            task.cancel()
+
+
+async def translate_lines(
+    lines: Iterable[str], out: TextIO, kind: str, translate: TranslateFn,
+    on_progress: Callable[[int], Awaitable[None]] | None = None,
+    max_tokens: int = DOC_CHUNK_TOKENS, concurrency: int = DOC_CONCURRENCY
+) -> DocumentStats:
+    stats = DocumentStats()
+    reader = LineReader(lines)
+    chunks = iter_chunks(iter_segments(reader, kind, max_tokens * 4), max_tokens)
+    async for chunk, translated in _ordered(chunks, translate, concurrency):
+        stats.chunks += 1
+        if translated is None:
+            # Keep the original text rather than losing the whole document.
+            translated = [segment.text for segment in chunk if segment.text]
+            stats.failed_chunks += 1
+            stats.failed_segments += len(translated)
+        results = iter(translated)
+        for segment in chunk:
+            out.write(segment.render(next(results) if segment.text else None))
+            stats.segments += bool(segment.text)
+        if on_progress:
+            await on_progress(chunk[-1].offset)
+    return stats
+
+
+async def translate_file(
+    source: Path, destination: Path, translate: TranslateFn,
+    on_progress: Callable[[int], Awaitable[None]] | None = None
+) -> DocumentStats:
+    with open(source, "r", encoding="utf-8-sig", errors="replace") as src, \
+            open(destination, "w", encoding="utf-8") as dst:
+        return await translate_lines(src, dst, source.suffix.lower(), translate, on_progress)
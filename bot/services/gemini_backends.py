@@ -0,0 +1,306 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from config import (
+    GEMINI_API_KEY, GEMINI_BACKEND, FAKE_GEMINI_LATENCY, FAKE_GEMINI_ERROR_RATE,
+    FAKE_GEMINI_TOKENS_PER_SECOND, FAKE_GEMINI_FIXTURES, FAKE_GEMINI_SEED
+)
+from bot.services.gemini_schemas import SCHEMAS
+
+
+@dataclass
+class BackendResponse:
+    text: str | None
+    model: str
+    usage: dict = field(default_factory=dict)
+
+
+class GeminiBackend(ABC):
+    @abstractmethod
+    async def generate(
+        self, contents, *, model: str, generation_config: dict | None = None,
+        system_instruction: str | None = None
+    ) -> BackendResponse:
+        ...
+
+    @abstractmethod
+    def generate_stream(
+        self, contents, *, model: str, generation_config: dict | None = None,
+        system_instruction: str | None = None
+    ) -> AsyncIterator[str]:
+        ...
+
+    def warm_up(self):
+        pass
+
+
+class GoogleGeminiBackend(GeminiBackend):
+    def __init__(self, api_key: str | None):
+        self._api_key = api_key
+        self._genai = None
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        # google.generativeai takes over a second to import, so it is loaded
+        # on first use (or from a background thread right after startup).
+        if self._genai is not None:
+            return
+        with self._lock:
+            if self._genai is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=self._api_key)
+                self._genai = genai
+
+    def _get_model(self, model: str, system_instruction: str | None):
+        self.warm_up()
+        key = (model, system_instruction)
+        if key not in self._models:
+            self._models[key] = self._genai.GenerativeModel(
+                model, system_instruction=system_instruction
+            )
+        return self._models[key]
+
+    @staticmethod
+    def _usage(response) -> dict:
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return {}
+        return {
+            "input_tokens": usage.prompt_token_count,
+            "output_tokens": usage.candidates_token_count,
+        }
+
+    async def generate(
+        self, contents, *, model: str, generation_config: dict | None = None,
+        system_instruction: str | None = None
+    ) -> BackendResponse:
+        gen_model = self._get_model(model, system_instruction)
+        config_obj = (
+            self._genai.GenerationConfig(**generation_config)
+            if generation_config else None
+        )
+        response = await gen_model.generate_content_async(
+            contents, generation_config=config_obj
+        )
+        text = None
+        if response.candidates and response.candidates[0].content.parts:
+            text = response.text.strip()
+        return BackendResponse(text=text, model=model, usage=self._usage(response))
+
+    async def generate_stream(
+        self, contents, *, model: str, generation_config: dict | None = None,
+        system_instruction: str | None = None
+    ) -> AsyncIterator[str]:
+        gen_model = self._get_model(model, system_instruction)
+        config_obj = (
+            self._genai.GenerationConfig(**generation_config)
+            if generation_config else None
+        )
+        response = await gen_model.generate_content_async(
+            contents, generation_config=config_obj, stream=True
+        )
+        async for chunk in response:
+            if chunk.candidates and chunk.candidates[0].content.parts:
+                yield chunk.text
+
+
+class FakeBackendError(Exception):
+    pass
+
+
+# Templated responses keyed by schema name ("text" and "chat" for free-form
+# prompts). "{n}" is a running counter and "{excerpt}" the start of the prompt.
+DEFAULT_FIXTURES = {
+    "translation": [{
+        "translated_text": "[fake translation {n}] {excerpt}",
+        "detected_language_name": "English",
+    }],
+    "image_text": [{
+        "found_text": "Fake text found in image {n}",
+        "translated_text": "[fake translation {n}] Fake text found in image",
+        "detected_language_name": "English",
+    }],
+    "album_text": [{
+        "images": [{
+            "found_text": "Fake text found in image {n}",
+            "translated_text": "[fake translation {n}] Fake text found in image",
+            "detected_language_name": "English",
+        }],
+    }],
+    "segments": [{"segments": ["[fake translation {n}]"]}],
+    "word": [{"item": "palabra{n}", "translation": "word{n}"}],
+    "quiz": [{
+        "question": "Fake question {n}?",
+        "options": ["alpha", "beta", "gamma", "delta"],
+        "correct_answer_text": "beta",
+    }],
+    "concept": [{
+        "item": "Fake concept {n}",
+        "explanation": "An explanation of fake concept {n}.",
+        "code_example": "print({n})",
+    }],
+    "feedback": [{"feedback": "Good attempt (fake feedback {n})."}],
+    "text": ["Fake fun fact {n}: {excerpt}"],
+    "chat": ["Fake reply {n} to: {excerpt}"],
+}
+
+
+def parse_latency_spec(spec: str):
+    # "fixed:MS", "uniform:MIN_MS:MAX_MS" or "lognormal:MEDIAN_MS:SIGMA"
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda rnd: values[0] / 1000
+    if kind == "uniform":
+        return lambda rnd: rnd.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rnd: rnd.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _count_images(contents) -> int:
+    if isinstance(contents, (list, tuple)):
+        return sum(_count_images(part) for part in contents)
+    return int(isinstance(contents, dict) and "mime_type" in contents)
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, dict):
+        if "parts" in contents:
+            return _prompt_text(contents["parts"])
+        return contents.get("text", "")
+    if isinstance(contents, (list, tuple)):
+        texts = [_prompt_text(part) for part in contents]
+        return next((t for t in reversed(texts) if t), "")
+    return ""
+
+
+class FakeGeminiBackend(GeminiBackend):
+    def __init__(
+        self, latency: str = "fixed:0", error_rate: float = 0.0,
+        tokens_per_second: float = 0.0, fixtures: dict | None = None,
+        seed: int | None = None
+    ):
+        self._latency = parse_latency_spec(latency)
+        self._error_rate = error_rate
+        self._tokens_per_second = tokens_per_second
+        self._fixtures = {**DEFAULT_FIXTURES, **(fixtures or {})}
+        self._random = random.Random(seed)
+        self._counter = 0
+
+    @classmethod
+    def from_config(cls) -> "FakeGeminiBackend":
+        fixtures = None
+        if FAKE_GEMINI_FIXTURES:
+            with open(FAKE_GEMINI_FIXTURES, "r", encoding="utf-8") as f:
+                fixtures = json.load(f)
+        return cls(
+            latency=FAKE_GEMINI_LATENCY,
+            error_rate=FAKE_GEMINI_ERROR_RATE,
+            tokens_per_second=FAKE_GEMINI_TOKENS_PER_SECOND,
+            fixtures=fixtures,
+            seed=FAKE_GEMINI_SEED,
+        )
+
+    def _fixture_key(self, contents, generation_config, system_instruction) -> str:
+        schema = (generation_config or {}).get("response_schema")
+        if schema:
+            for name, registered in SCHEMAS.items():
+                if registered.json_schema == schema:
+                    return name
+        if system_instruction or (
+            isinstance(contents, list) and contents
+            and isinstance(contents[0], dict) and "role" in contents[0]
+        ):
+            return "chat"
+        return "text"
+
+    def _render(self, template, excerpt: str):
+        if isinstance(template, str):
+            return template.replace("{n}", str(self._counter)).replace("{excerpt}", excerpt)
+        if isinstance(template, list):
+            return [self._render(item, excerpt) for item in template]
+        if isinstance(template, dict):
+            return {key: self._render(value, excerpt) for key, value in template.items()}
+        return template
+
+    async def generate_stream(
+        self, contents, *, model: str, generation_config: dict | None = None,
+        system_instruction: str | None = None
+    ) -> AsyncIterator[str]:
+        self._counter += 1
+        prompt = _prompt_text(contents)
+        key = self._fixture_key(contents, generation_config, system_instruction)
+        body = self._render(self._random.choice(self._fixtures[key]), prompt[:40])
+        if key == "segments":
+            # Echo the input list so callers get one entry per segment.
+            inputs = json.loads(prompt.rsplit("\n", 1)[-1])
+            label = body["segments"][0]
+            body = {"segments": [f"{label} {text}" for text in inputs]}
+        if key == "album_text":
+            # One entry per image sent, like the real model is asked to return.
+            entries = body["images"]
+            body = {"images": [entries[i % len(entries)] for i in range(_count_images(contents))]}
+        text = body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)
+
+        await asyncio.sleep(self._latency(self._random))
+        if self._random.random() < self._error_rate:
+            raise FakeBackendError(f"Injected upstream error for '{key}'")
+
+        if not self._tokens_per_second:
+            yield text
+            return
+        # Emit roughly token-sized words at the configured output rate.
+        words = text.split(" ")
+        for i in range(0, len(words), 8):
+            await asyncio.sleep(8 / self._tokens_per_second)
+            yield " ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "")
+
+    async def generate(
+        self, contents, *, model: str, generation_config: dict | None = None,
+        system_instruction: str | None = None
+    ) -> BackendResponse:
+        chunks = [
+            chunk async for chunk in self.generate_stream(
+                contents, model=model, generation_config=generation_config,
+                system_instruction=system_instruction
+            )
+        ]
+        text = "".join(chunks)
+        usage = {
+            "input_tokens": len(_prompt_text(contents)) // 4,
+            "output_tokens": len(text) // 4,
+        }
+        return BackendResponse(text=text.strip(), model=model, usage=usage)
+
+
+def create_backend(name: str | None = None) -> GeminiBackend:
+    name = name or GEMINI_BACKEND
+    if name == "fake":
+        logging.warning("Using the offline fake Gemini backend.")
+        return FakeGeminiBackend.from_config()
+    if name == "google":
+        return GoogleGeminiBackend(GEMINI_API_KEY)
+    raise ValueError(f"Unknown GEMINI_BACKEND: {name}")
+
+
+_default_backend = None
+
+
+def get_default_backend() -> GeminiBackend:
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = create_backend()
+    return _default_backend
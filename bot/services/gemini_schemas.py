@@ -0,0 +1,191 @@
+import json
+import typing
+from dataclasses import dataclass, field, fields, is_dataclass, MISSING
+from bot.utils.metrics import register_metrics
+
+
+class SchemaValidationError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class TranslationResult:
+    translated_text: str
+    detected_language_name: str = ""
+
+
+@dataclass(frozen=True)
+class ImageTextResult:
+    translated_text: str
+    found_text: str = ""
+    detected_language_name: str = ""
+
+
+@dataclass(frozen=True)
+class SegmentsResult:
+    segments: list[str]
+
+
+@dataclass(frozen=True)
+class AlbumImageText:
+    # Unlike a single image, an album may contain images without any text.
+    translated_text: str = ""
+    found_text: str = ""
+    detected_language_name: str = ""
+
+
+@dataclass(frozen=True)
+class AlbumTextResult:
+    images: list[AlbumImageText]
+
+
+@dataclass(frozen=True)
+class WordItem:
+    item: str
+    translation: str
+
+
+@dataclass(frozen=True)
+class QuizItem:
+    question: str
+    options: list[str]
+    correct_answer_text: str
+
+    def validate(self):
+        if len(self.options) < 2:
+            raise SchemaValidationError("quiz needs at least two options")
+        normalized = {opt.strip().lower() for opt in self.options}
+        if self.correct_answer_text.strip().lower() not in normalized:
+            raise SchemaValidationError("correct answer is not one of the options")
+
+
+@dataclass(frozen=True)
+class ConceptItem:
+    item: str
+    explanation: str
+    code_example: str = ""
+
+
+@dataclass(frozen=True)
+class AnswerFeedback:
+    feedback: str
+
+
+_JSON_TYPES = {str: "STRING", int: "INTEGER", float: "NUMBER", bool: "BOOLEAN"}
+
+
+def _model_fields(model: type) -> list[tuple[str, typing.Any, bool]]:
+    hints = typing.get_type_hints(model)
+    return [(f.name, hints[f.name], f.default is MISSING) for f in fields(model)]
+
+
+def _object_schema(model: type) -> dict:
+    model_fields = _model_fields(model)
+    return {
+        "type": "OBJECT",
+        "properties": {name: _field_schema(hint) for name, hint, _req in model_fields},
+        "required": [name for name, _hint, required in model_fields if required],
+    }
+
+
+def _field_schema(annotation) -> dict:
+    if typing.get_origin(annotation) is list:
+        (item_type,) = typing.get_args(annotation)
+        return {"type": "ARRAY", "items": _field_schema(item_type)}
+    if is_dataclass(annotation):
+        return _object_schema(annotation)
+    return {"type": _JSON_TYPES[annotation]}
+
+
+def _parse_object(model: type, data):
+    if not isinstance(data, dict):
+        raise SchemaValidationError(f"'{model.__name__}' must be an object")
+
+    values = {}
+    for name, hint, required in _model_fields(model):
+        value = data.get(name)
+        if value is None or value == "" or value == []:
+            if required:
+                raise SchemaValidationError(f"missing required field '{name}'")
+            continue
+        values[name] = _check_value(name, hint, value)
+
+    result = model(**values)
+    if hasattr(result, "validate"):
+        result.validate()
+    return result
+
+
+def _check_value(name: str, annotation, value):
+    if typing.get_origin(annotation) is list:
+        (item_type,) = typing.get_args(annotation)
+        if not isinstance(value, list):
+            raise SchemaValidationError(f"'{name}' must be a list")
+        return [_check_value(name, item_type, item) for item in value]
+    if is_dataclass(annotation):
+        return _parse_object(annotation, value)
+    if not isinstance(value, annotation) or isinstance(value, bool) != (annotation is bool):
+        raise SchemaValidationError(f"'{name}' must be {annotation.__name__}")
+    return value.strip() if isinstance(value, str) else value
+
+
+@dataclass
+class ResponseSchema:
+    name: str
+    model: type
+    json_schema: dict = field(init=False)
+
+    def __post_init__(self):
+        self.json_schema = _object_schema(self.model)
+
+    def parse(self, response_text: str):
+        try:
+            data = json.loads(response_text)
+        except json.JSONDecodeError as e:
+            raise SchemaValidationError(f"invalid JSON: {e}") from e
+        if not isinstance(data, dict):
+            raise SchemaValidationError("top-level value must be an object")
+        return _parse_object(self.model, data)
+
+
+@dataclass
+class SchemaStats:
+    requests: int = 0
+    parsed: int = 0
+    retries: int = 0
+    parse_failures: int = 0
+    upstream_failures: int = 0
+
+    def as_dict(self) -> dict:
+        failures = self.parse_failures + self.upstream_failures
+        return {
+            "requests": self.requests,
+            "parsed": self.parsed,
+            "retries": self.retries,
+            "parse_failures": self.parse_failures,
+            "upstream_failures": self.upstream_failures,
+            "failure_rate": round(failures / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+SCHEMAS = {
+    schema.name: schema for schema in (
+        ResponseSchema("translation", TranslationResult),
+        ResponseSchema("image_text", ImageTextResult),
+        ResponseSchema("album_text", AlbumTextResult),
+        ResponseSchema("segments", SegmentsResult),
+        ResponseSchema("word", WordItem),
+        ResponseSchema("quiz", QuizItem),
+        ResponseSchema("concept", ConceptItem),
+        ResponseSchema("feedback", AnswerFeedback),
+    )
+}
+
+schema_stats = {name: SchemaStats() for name in SCHEMAS}
+
+
+def get_schema_stats() -> dict:
+    return {name: stats.as_dict() for name, stats in schema_stats.items()}
+
+
+register_metrics("gemini_schemas", get_schema_stats)
@@ -1,90 +1,229 @@
-import google.generativeai as genai
-import logging
 import json
-import io
+import logging
 import html
 import asyncio
-from PIL import Image
-from config import GEMINI_API_KEY, GEMINI_MODEL
+import time
 from database.db_utils import get_chat_history, add_to_chat_history
+from bot.services.gemini_backends import GeminiBackend, get_default_backend
+from bot.services.gemini_schemas import (
+    SCHEMAS, SchemaValidationError, schema_stats,
+    TranslationResult, ImageTextResult, AlbumTextResult, SegmentsResult,
+    WordItem, QuizItem, ConceptItem
+)
+from bot.services.usage_tracker import usage_tracker
+from bot.services.model_router import model_router
+from bot.services.image_pipeline import PreparedImage
+from bot.utils.rate_limit import TokenBucket
+from bot.utils.metrics import register_metrics
+from config import GEMINI_RPM, GEMINI_BURST, GEMINI_MAX_CONCURRENCY, BOT_WORKERS
+
+# Shared by all GeminiService instances. The quota and the concurrency cap are
+# for the whole bot, so with BOT_WORKERS processes each one gets its share.
+_workers = max(BOT_WORKERS, 1)
+gemini_rate_limiter = TokenBucket(GEMINI_RPM / 60 / _workers, max(GEMINI_BURST / _workers, 1))
+_gemini_slots = asyncio.Semaphore(max(GEMINI_MAX_CONCURRENCY // _workers, 1))
 
-# Կոնֆիգուրացիան կատարում ենք պարզ եղանակով։
-# Գրադարանը ինքնուրույն կվերցնի Proxy-ն միջավայրի փոփոխականներից, եթե դրանք սահմանված են։
-genai.configure(api_key=GEMINI_API_KEY)
+register_metrics("gemini_rate_limiter", gemini_rate_limiter.snapshot)
 
 
 class GeminiService:
-    def __init__(self):
-        self.model = genai.GenerativeModel(GEMINI_MODEL)
+    def __init__(self, backend: GeminiBackend | None = None):
+        self._backend = backend
+
+    @property
+    def backend(self) -> GeminiBackend:
+        # All handler modules share the process-wide backend, created on first use.
+        if self._backend is None:
+            self._backend = get_default_backend()
+        return self._backend
+
+    async def _generate(
+        self, contents, feature: str, user_id: int | None = None,
+        attempt: int = 0, input_chars: int = 0,
+        generation_config: dict | None = None, **kwargs
+    ):
+        # Every upstream call goes through here so it is routed and accounted per feature.
+        route = model_router.select(feature, input_chars)
+        if generation_config or route.generation_config:
+            generation_config = {**(generation_config or {}), **route.generation_config}
+
+        await gemini_rate_limiter.acquire()
+        started = time.perf_counter()
+        response, outcome = None, "error"
+        try:
+            async with _gemini_slots:
+                response = await self.backend.generate(
+                    contents, model=route.model,
+                    generation_config=generation_config, **kwargs
+                )
+            outcome = "ok" if response.text else "empty"
+            return response
+        finally:
+            usage_tracker.record(
+                feature=feature,
+                user_id=user_id,
+                model=route.model,
+                usage=response.usage if response else {},
+                latency=time.perf_counter() - started,
+                retries=attempt,
+                outcome=outcome,
+                route=route.name,
+            )
 
     async def _safe_generate(
-        self, prompt, use_json_config: bool = True, temperature: float = 0.4
+        self, prompt, feature: str, user_id: int | None = None,
+        use_json_config: bool = True, temperature: float = 0.4,
+        response_schema: dict | None = None, attempt: int = 0,
+        input_chars: int = 0
     ) -> str | None:
         try:
             config_params = {"temperature": temperature}
             if use_json_config:
                 config_params["response_mime_type"] = "application/json"
+            if response_schema:
+                config_params["response_schema"] = response_schema
 
-            config = genai.GenerationConfig(**config_params)
-            response = await self.model.generate_content_async(
-                prompt, generation_config=config
+            response = await self._generate(
+                prompt, feature, user_id, attempt, input_chars,
+                generation_config=config_params
             )
 
-            if not response.candidates:
+            if response.text is None:
                 logging.warning("Gemini returned no candidates.")
                 return None
-            return response.text.strip()
+            return response.text
         except Exception as e:
             logging.error(f"Gemini API error in _safe_generate: {e}")
             if hasattr(e, 'response'):
                 logging.error(f"Gemini response: {e.response.text}")
             return None
 
-    def _parse_json_response(self, response_text: str) -> dict | None:
-        try:
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
-            logging.error(f"Failed to parse Gemini JSON: {e}\n{response_text}")
-            return None
+    async def _generate_structured(
+        self, prompt, schema_name: str, feature: str,
+        user_id: int | None = None, temperature: float = 0.4,
+        attempts: int = 1, input_chars: int = 0
+    ):
+        schema = SCHEMAS[schema_name]
+        stats = schema_stats[schema_name]
+        for attempt in range(attempts):
+            if attempt:
+                stats.retries += 1
+                await asyncio.sleep(0.5)
+            stats.requests += 1
+
+            response_str = await self._safe_generate(
+                prompt, feature, user_id, temperature=temperature,
+                response_schema=schema.json_schema, attempt=attempt,
+                input_chars=input_chars
+            )
+            if not response_str:
+                stats.upstream_failures += 1
+                continue
+            try:
+                result = schema.parse(response_str)
+            except SchemaValidationError as e:
+                stats.parse_failures += 1
+                logging.error(
+                    f"Gemini response does not match schema '{schema_name}': "
+                    f"{e}\n{response_str}"
+                )
+                continue
+            stats.parsed += 1
+            return result
+        return None
 
     async def get_text_from_image(
-        self, image_bytes: io.BytesIO, target_lang: str
-    ) -> dict | None:
-        try:
-            img = Image.open(image_bytes)
-        except Exception as e:
-            logging.error(f"Pillow could not open image bytes: {e}")
-            return None
+        self, image: PreparedImage, target_lang: str,
+        user_id: int | None = None
+    ) -> ImageTextResult | None:
         prompt = [
             (
-                f"Analyze this image. Identify all text. Then, translate it to "
-                f"{target_lang}. Format as JSON: "
-                f'{{"found_text": "...", "translated_text": "...", "detected_language_name": "..."}}'
+                f"Analyze this image. Identify all text as found_text. Then, "
+                f"translate it to {target_lang} as translated_text and name "
+                f"the language of the original text in English."
             ),
-            img
+            image.as_part()
         ]
-        response_str = await self._safe_generate(prompt, temperature=0.1)
-        if not response_str:
+        return await self._generate_structured(
+            prompt, "image_text", "ocr", user_id, temperature=0.1
+        )
+
+    async def get_text_from_images(
+        self, images: list[PreparedImage], target_lang: str,
+        user_id: int | None = None
+    ) -> list[ImageTextResult | None] | None:
+        # None stands for an image without text.
+        prompt = [(
+            f"You are given {len(images)} numbered images. For each image, in "
+            f"order, identify all text as found_text, translate it to "
+            f"{target_lang} as translated_text and name the language of the "
+            f"original text in English. Return exactly one entry per image in "
+            f"the images list; use an empty found_text if an image has no text."
+        )]
+        for number, image in enumerate(images, start=1):
+            prompt.append(f"Image {number}:")
+            prompt.append(image.as_part())
+
+        result: AlbumTextResult | None = await self._generate_structured(
+            prompt, "album_text", "ocr", user_id, temperature=0.1
+        )
+        if result and len(result.images) != len(images):
+            logging.error(
+                f"Gemini returned {len(result.images)} results for "
+                f"{len(images)} images."
+            )
             return None
-        return self._parse_json_response(response_str)
+        if not result:
+            return None
+        return [
+            ImageTextResult(
+                translated_text=item.translated_text,
+                found_text=item.found_text,
+                detected_language_name=item.detected_language_name
+            ) if item.translated_text else None
+            for item in result.images
+        ]
 
     async def translate_text(
-        self, text: str, target_language: str, source_language: str = "auto"
-    ) -> dict | None:
+        self, text: str, target_language: str, source_language: str = "auto",
+        user_id: int | None = None
+    ) -> TranslationResult | None:
         prompt = (
             f'Translate "{text}" into {target_language}. Source language is '
-            f'{source_language}. Respond in JSON: '
-            f'{{"detected_language_name": "...", "translated_text": "..."}}'
+            f'{source_language}. Name the detected source language in English.'
+        )
+        return await self._generate_structured(
+            prompt, "translation", "translate", user_id, temperature=0.2,
+            input_chars=len(text)
+        )
+
+    async def translate_segments(
+        self, segments: list[str], target_language: str,
+        source_language: str = "auto", user_id: int | None = None
+    ) -> list[str] | None:
+        prompt = (
+            f"Translate each string of the JSON list below into {target_language}. "
+            f"Source language is {source_language}. Return exactly "
+            f"{len(segments)} segments in the same order. Keep line breaks, "
+            f"Markdown markup, URLs and placeholders unchanged.\n"
+            f"{json.dumps(segments, ensure_ascii=False)}"
         )
-        response_str = await self._safe_generate(prompt, temperature=0.2)
-        if not response_str:
+        result: SegmentsResult | None = await self._generate_structured(
+            prompt, "segments", "translate", user_id, temperature=0.2,
+            attempts=2, input_chars=sum(len(s) for s in segments)
+        )
+        if result and len(result.segments) != len(segments):
+            logging.error(
+                f"Gemini returned {len(result.segments)} segments for "
+                f"{len(segments)} inputs."
+            )
             return None
-        return self._parse_json_response(response_str)
+        return result.segments if result else None
 
     async def get_learning_item(
         self, item_type: str, mode: str, lang_info: dict, level: str,
-        recent_items: list | None = None
-    ) -> dict | None:
+        recent_items: list | None = None, user_id: int | None = None
+    ) -> WordItem | QuizItem | ConceptItem | None:
         recent_prompt = ""
         if recent_items:
             items_str = ", ".join(f'"{item}"' for item in recent_items)
@@ -110,10 +249,12 @@ class GeminiService:
         else:
             return None
 
-        response_str = await self._safe_generate(prompt, temperature=0.95)
-        if not response_str:
+        if not prompt or item_type not in SCHEMAS:
             return None
-        return self._parse_json_response(response_str)
+        return await self._generate_structured(
+            prompt, item_type, item_type, user_id,
+            temperature=0.95, attempts=3
+        )
 
     def _get_human_lang_prompt(
         self, item_type: str, lang_info: dict, level: str, recent_prompt: str
@@ -122,15 +263,13 @@ class GeminiService:
         if item_type == 'word':
             return (
                 f"Generate one interesting word in {learning} for a {level} "
-                f"learner. Provide its translation in {native}.{recent_prompt}\n"
-                f"JSON response: {{\"item\": \"...\", \"translation\": \"...\"}}"
+                f"learner. Provide its translation in {native}.{recent_prompt}"
             )
         if item_type == 'quiz':
             return (
                 f"Create a multiple-choice quiz about {learning} for a {native} "
-                f"speaker at {level} level.{recent_prompt}\nJSON response: "
-                f"{{\"question\": \"...\", \"options\": [...], "
-                f"\"correct_answer_text\": \"...\"}}"
+                f"speaker at {level} level.{recent_prompt}\n"
+                f"correct_answer_text must be the exact text of one option."
             )
         return None
 
@@ -151,20 +290,18 @@ class GeminiService:
                 f"Generate a core concept for a {prog_lang} developer at "
                 f"'{level}' level. {academic_prompt}{recent_prompt} "
                 f"{lang_instruction}\nProvide an explanation and a code example."
-                f"\nJSON response: {{\"item\": \"...\", \"explanation\": \"...\", "
-                f"\"code_example\": \"...\"}}"
             )
         if item_type == 'quiz':
             return (
                 f"Create a quiz about {prog_lang} for a developer at '{level}' "
                 f"level. {academic_prompt}{recent_prompt} {lang_instruction}\n"
-                f"JSON response: {{\"question\": \"...\", \"options\": [...], "
-                f"\"correct_answer_text\": \"Exact text of correct option.\"}}"
+                f"correct_answer_text must be the exact text of one option."
             )
         return None
 
     async def get_fun_fact(
-        self, mode: str, subject: str, interface_lang: str
+        self, mode: str, subject: str, interface_lang: str,
+        user_id: int | None = None
     ) -> str | None:
         lang_instruction = f"CRITICAL: The fact MUST be in {interface_lang}."
         if mode == 'human':
@@ -179,50 +316,55 @@ class GeminiService:
             )
 
         response_str = await self._safe_generate(
-            prompt, use_json_config=False, temperature=1.0
+            prompt, "fact", user_id, use_json_config=False, temperature=1.0
         )
         return html.unescape(response_str) if response_str else None
 
     async def evaluate_user_answer(
         self, original_text: str, user_translation: str,
-        source_lang: str, target_lang: str
+        source_lang: str, target_lang: str, user_id: int | None = None
     ) -> str | None:
         prompt = (
             f'Original: "{original_text}" ({source_lang}). User translation: '
             f'"{user_translation}" ({target_lang}). Provide brief feedback in '
-            f'{target_lang}.\nJSON response: {{"feedback": "..."}}'
+            f'{target_lang}.'
         )
-        response_str = await self._safe_generate(prompt, temperature=0.5)
-        if not response_str:
-            return None
-        data = self._parse_json_response(response_str)
-        return data.get("feedback") if data else None
+        result = await self._generate_structured(
+            prompt, "feedback", "evaluate", user_id, temperature=0.5,
+            input_chars=len(original_text or "") + len(user_translation)
+        )
+        return result.feedback if result else None
 
     async def chat_with_ai(
         self, user_id: int, user_prompt: str,
         persona: str | None = None
-    ) -> str:
+    ) -> str | None:
+        # None when the AI service call failed, so callers can retry it.
+        feature = "chat" if persona is None else "roleplay"
         if persona is None:
             persona = "You are a helpful and friendly AI language tutor."
 
-        chat_model = genai.GenerativeModel(
-            GEMINI_MODEL,
-            system_instruction=persona
-        )
-        
         history = await get_chat_history(user_id)
         current_chat_history = history + [{"role": "user", "parts": [{"text": user_prompt}]}]
 
         try:
-            await add_to_chat_history(user_id, 'user', user_prompt)
-            response = await chat_model.generate_content_async(current_chat_history)
+            history_chars = sum(
+                len(part["text"]) for item in current_chat_history for part in item["parts"]
+            )
+            response = await self._generate(
+                current_chat_history, feature, user_id,
+                input_chars=history_chars, system_instruction=persona
+            )
 
-            if response.candidates and response.candidates[0].content.parts:
-                response_text = response.text.strip()
+            if response.text:
+                response_text = response.text
+                # Saved only together with the answer, so a cancelled or failed
+                # call leaves no unanswered turn in the history.
+                await add_to_chat_history(user_id, 'user', user_prompt)
                 await add_to_chat_history(user_id, 'model', response_text)
                 return response_text
 
             return "Sorry, I couldn't generate a response."
         except Exception as e:
             logging.error(f"Gemini chat error for user {user_id}: {e}")
-            return "An error occurred with the AI service. Please try again."
\ No newline at end of file
+            return None
\ No newline at end of file
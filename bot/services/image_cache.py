@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from config import (
+    IMAGE_CACHE_SIZE, IMAGE_CACHE_MAX_DISTANCE, IMAGE_CACHE_MAX_CHANGED_PIXELS, IMAGE_CACHE_PIXEL_TOLERANCE
+)
+from bot.utils.metrics import register_metrics
+
+
+@dataclass
+class CachedImageText:
+    found_text: str
+    detected_language_name: str
+    translations: dict[str, str] = field(default_factory=dict)
+    unique_ids: set[str] = field(default_factory=set)
+    phash: int | None = None
+    aspect: float = 0.0
+    thumbnail: bytes | None = None
+
+
+def is_distinctive(phash: int) -> bool:
+    # Near-uniform images (blank backgrounds, plain text on white) produce
+    # almost-empty hashes that would collide with each other.
+    return 8 <= phash.bit_count() <= 56
+
+
+def changed_pixels(a: bytes, b: bytes, tolerance: int = IMAGE_CACHE_PIXEL_TOLERANCE) -> int:
+    if len(a) != len(b):
+        return len(a) or len(b)
+    return sum(abs(x - y) > tolerance for x, y in zip(a, b))
+
+
+class ImageTextCache:
+    # LRU of OCR results. Lookups go by Telegram's file_unique_id first and
+    # fall back to a perceptual hash, so re-encoded copies of a picture hit too.
+    # A hash match only counts when the thumbnails agree as well.
+    def __init__(
+        self, max_entries: int = IMAGE_CACHE_SIZE, max_distance: int = IMAGE_CACHE_MAX_DISTANCE,
+        max_changed_pixels: int = IMAGE_CACHE_MAX_CHANGED_PIXELS
+    ):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_changed_pixels = max_changed_pixels
+        self._entries: OrderedDict[int, CachedImageText] = OrderedDict()
+        self._by_unique_id: dict[str, int] = {}
+        self._next_id = 0
+        self.stats = {"unique_id_hits": 0, "phash_hits": 0, "thumbnail_rejects": 0, "misses": 0, "text_translations": 0}
+
+    def _touch(self, entry_id: int) -> CachedImageText:
+        self._entries.move_to_end(entry_id)
+        return self._entries[entry_id]
+
+    def get_by_unique_ids(self, unique_ids: list[str]) -> CachedImageText | None:
+        for unique_id in unique_ids:
+            entry_id = self._by_unique_id.get(unique_id)
+            if entry_id is not None:
+                self.stats["unique_id_hits"] += 1
+                return self._touch(entry_id)
+        return None
+
+    def get_by_phash(
+        self, phash: int | None, aspect: float, thumbnail: bytes | None, unique_ids: list[str] = ()
+    ) -> CachedImageText | None:
+        if phash is None or thumbnail is None or not is_distinctive(phash):
+            self.stats["misses"] += 1
+            return None
+        best_id, best_distance = None, self.max_distance + 1
+        for entry_id, entry in self._entries.items():
+            if entry.phash is None or abs(entry.aspect - aspect) > 0.02 * aspect:
+                continue
+            distance = (entry.phash ^ phash).bit_count()
+            if distance >= best_distance:
+                continue
+            if changed_pixels(entry.thumbnail, thumbnail) > self.max_changed_pixels:
+                self.stats["thumbnail_rejects"] += 1
+                continue
+            best_id, best_distance = entry_id, distance
+        if best_id is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["phash_hits"] += 1
+        entry = self._touch(best_id)
+        # Remember this copy's ids so the next lookup skips the download.
+        for unique_id in unique_ids:
+            entry.unique_ids.add(unique_id)
+            self._by_unique_id[unique_id] = best_id
+        return entry
+
+    def put(
+        self, unique_ids: list[str], phash: int | None, aspect: float, thumbnail: bytes | None,
+        found_text: str, detected_language_name: str,
+        target_lang: str, translated_text: str
+    ) -> CachedImageText:
+        if thumbnail is None or (phash is not None and not is_distinctive(phash)):
+            phash = None
+        entry = CachedImageText(
+            found_text=found_text,
+            detected_language_name=detected_language_name,
+            translations={target_lang: translated_text},
+            unique_ids=set(unique_ids),
+            phash=phash,
+            aspect=aspect,
+            thumbnail=thumbnail if phash is not None else None,
+        )
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        for unique_id in unique_ids:
+            self._by_unique_id[unique_id] = entry_id
+
+        while len(self._entries) > self.max_entries:
+            old_id, old_entry = self._entries.popitem(last=False)
+            for unique_id in old_entry.unique_ids:
+                if self._by_unique_id.get(unique_id) == old_id:
+                    del self._by_unique_id[unique_id]
+        return entry
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "entries": len(self._entries)}
+
+
+image_cache = ImageTextCache()
+
+register_metrics("image_cache", image_cache.snapshot)
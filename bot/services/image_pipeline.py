@@ -0,0 +1,104 @@
+import asyncio
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from aiogram.types import PhotoSize
+
+from config import (
+    IMAGE_OCR_TARGET_SIDE, IMAGE_MAX_SIDE, IMAGE_JPEG_QUALITY,
+    IMAGE_GRAYSCALE_SATURATION, IMAGE_WORKERS
+)
+
+# Decoding and resizing run here so the event loop never blocks on Pillow.
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    phash: int | None = None
+    thumbnail: bytes | None = None
+
+    def as_part(self) -> dict:
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def select_photo_size(photos: list[PhotoSize], target_side: int = IMAGE_OCR_TARGET_SIDE) -> PhotoSize:
+    # Telegram sends several sizes of the same photo; the smallest one that is
+    # still large enough for OCR saves download and upload bytes.
+    by_size = sorted(photos, key=lambda p: p.width * p.height)
+    for photo in by_size:
+        if max(photo.width, photo.height) >= target_side:
+            return photo
+    return by_size[-1]
+
+
+def _is_mostly_gray(img) -> bool:
+    from PIL import ImageStat
+
+    sample = img.convert("RGB")
+    sample.thumbnail((64, 64))
+    saturation = sample.convert("HSV").getchannel("S")
+    return ImageStat.Stat(saturation).mean[0] <= IMAGE_GRAYSCALE_SATURATION
+
+
+def difference_hash(img) -> int:
+    # 64-bit dHash: survives re-encoding and resizing, unlike byte hashes.
+    from PIL import Image
+
+    small = img.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def grayscale_thumbnail(img, side: int = 64) -> bytes:
+    # Fine enough to see individual words, which the 64-bit hash can't.
+    from PIL import Image
+
+    return img.convert("L").resize((side, side), Image.Resampling.BOX).tobytes()
+
+
+def preprocess_image(
+    raw: bytes, max_side: int = IMAGE_MAX_SIDE, quality: int = IMAGE_JPEG_QUALITY
+) -> PreparedImage:
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(raw))
+    img = ImageOps.exif_transpose(img)
+    phash = difference_hash(img)
+    thumbnail = grayscale_thumbnail(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white so text stays readable.
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, "white")
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    if img.mode == "RGB" and _is_mostly_gray(img):
+        img = img.convert("L")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    return PreparedImage(out.getvalue(), "image/jpeg", img.width, img.height, phash, thumbnail)
+
+
+async def prepare_image(raw: bytes) -> PreparedImage | None:
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_executor, preprocess_image, raw)
+    except Exception as e:
+        logging.error(f"Could not preprocess image: {e}")
+        return None
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.types import Message
+
+from config import (
+    BOT_WORKERS, JOB_CONCURRENCY, JOB_LEASE_SECONDS, JOB_POLL_INTERVAL, JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BASE, JOB_RETRY_MAX, JOB_RETENTION_HOURS
+)
+from database.db_utils import (
+    get_or_create_user, enqueue_job, claim_job, extend_job_lease, update_job_payload, finish_job, retry_job,
+    requeue_running_jobs, reshard_jobs, count_jobs, purge_finished_jobs
+)
+from bot.middlewares.latest_wins import Superseded
+from bot.services.usage_tracker import percentile
+from bot.utils.metrics import register_metrics
+
+# Lower runs first.
+INTERACTIVE = 0
+BACKGROUND = 1
+
+HOUSEKEEPING_INTERVAL = 60
+
+
+class RetryableJobError(Exception):
+    # Raised by a handler whose upstream call (Gemini, gTTS) failed, so the
+    # job is tried again after a backoff. On the last attempt handlers tell
+    # the user instead of raising.
+    pass
+
+
+@dataclass
+class JobContext:
+    # What a handler had when the job was enqueued, rebuilt in the runner: the
+    # original message (bound to the bot, so .answer() works), the user's FSM
+    # context, texts and settings.
+    job: dict
+    message: Message
+    state: FSMContext
+    i18n: dict
+    user_db: dict
+
+    @property
+    def payload(self) -> dict:
+        return self.job['payload']
+
+    @property
+    def last_attempt(self) -> bool:
+        return self.job['attempts'] >= self.job['max_attempts']
+
+    async def state_unchanged(self) -> bool:
+        # The job runs outside ChatScheduler; if the user has moved on since
+        # it was enqueued, it must not overwrite the newer state.
+        return await self.state.get_state() == self.payload.get('fsm_state')
+
+    # Steps done by an earlier attempt (Gemini answers, stat increments) are
+    # recorded in the job, so a retry reuses them instead of repeating them.
+    def done(self, step: str) -> bool:
+        return step in self.payload.get('steps', {})
+
+    def result(self, step: str):
+        return self.payload['steps'][step]
+
+    async def record(self, step: str, value=True):
+        self.payload.setdefault('steps', {})[step] = value
+        await update_job_payload(self.job['id'], self.payload)
+
+
+JobHandler = Callable[[JobContext], Awaitable[None]]
+
+
+class JobRunner:
+    # Handlers enqueue work and return at once; `concurrency` worker tasks per
+    # process claim jobs of this process's shard from SQLite and post the
+    # results to the chat. A job's lease is renewed while it runs, so a job
+    # whose process died is claimed again once the lease runs out (and right
+    # away when that shard's runner restarts).
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, shards: int = BOT_WORKERS):
+        self.concurrency = concurrency
+        self.shards = max(shards, 1)
+        self.shard = 0
+        self.handlers: dict[str, JobHandler] = {}
+        self.bot: Bot | None = None
+        self.storage: BaseStorage | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        self._waits = deque(maxlen=1000)
+        self.running = 0
+        self.depth: dict = {}
+        self.stats = {
+            "enqueued": 0, "deduplicated": 0, "succeeded": 0, "retried": 0,
+            "failed": 0, "superseded": 0, "recovered": 0,
+        }
+
+    def handler(self, kind: str):
+        def decorator(func: JobHandler) -> JobHandler:
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    def shard_for(self, user_id: int) -> int:
+        return user_id % self.shards
+
+    async def enqueue(
+        self, kind: str, message: Message, state: FSMContext, payload: dict | None = None,
+        priority: int = INTERACTIVE, dedupe_key: str | None = None
+    ) -> bool:
+        user_id = message.from_user.id
+        job_id = await enqueue_job(
+            kind, user_id, message.chat.id, self.shard_for(user_id),
+            {
+                "message": message.model_dump(mode="json", exclude_none=True),
+                "fsm_state": await state.get_state(),
+                **(payload or {}),
+            },
+            priority=priority, dedupe_key=dedupe_key, max_attempts=JOB_MAX_ATTEMPTS
+        )
+        if job_id is None:
+            self.stats["deduplicated"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        if self._wakeup:
+            self._wakeup.set()
+        return True
+
+    async def start(self, bot: Bot, storage: BaseStorage):
+        self.bot, self.storage = bot, storage
+        self._wakeup = asyncio.Event()
+        if self.shard == 0:
+            moved = await reshard_jobs(self.shards)
+            if moved:
+                logging.info(f"Moved {moved} jobs from removed shards to {self.shards} shards")
+        recovered = await requeue_running_jobs(self.shard)
+        if recovered:
+            self.stats["recovered"] += recovered
+            logging.info(f"Requeued {recovered} interrupted jobs of shard {self.shard}")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._housekeeping()))
+
+    async def stop(self):
+        # Jobs cut off here stay 'running' and are requeued on the next start.
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await claim_job(self.shard, JOB_LEASE_SECONDS)
+            except Exception as e:
+                logging.error(f"Could not claim a job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                logging.error(f"Job {job['id']} bookkeeping failed: {e}")
+
+    async def _keep_lease(self, job_id: int):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            await extend_job_lease(job_id, JOB_LEASE_SECONDS)
+
+    async def _context(self, job: dict) -> JobContext:
+        user_db = await get_or_create_user(job['user_id'])
+        return JobContext(
+            job=job,
+            message=Message.model_validate(job['payload']['message']).as_(self.bot),
+            state=FSMContext(
+                storage=self.storage,
+                key=StorageKey(bot_id=self.bot.id, chat_id=job['chat_id'], user_id=job['user_id'])
+            ),
+            i18n=self.bot.loc_middleware.texts_for(user_db.get('interface_lang', 'en')),
+            user_db=user_db,
+        )
+
+    async def _run(self, job: dict):
+        handler = self.handlers.get(job['kind'])
+        if handler is None:
+            await finish_job(job['id'], 'failed', f"no handler for {job['kind']}")
+            self.stats["failed"] += 1
+            return
+
+        self._waits.append(time.time() - job['available_at'])
+        lease = asyncio.create_task(self._keep_lease(job['id']))
+        self.running += 1
+        try:
+            await handler(await self._context(job))
+        except Superseded:
+            await finish_job(job['id'], 'done', 'superseded')
+            self.stats["superseded"] += 1
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job['attempts'] >= job['max_attempts']:
+                logging.error(f"Job {job['id']} ({job['kind']}) failed for good: {error}")
+                await finish_job(job['id'], 'failed', error)
+                self.stats["failed"] += 1
+            else:
+                delay = min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** (job['attempts'] - 1)) * random.uniform(0.8, 1.2)
+                logging.warning(f"Job {job['id']} ({job['kind']}) failed, retry in {delay:.1f}s: {error}")
+                await retry_job(job['id'], delay, error)
+                self.stats["retried"] += 1
+        else:
+            await finish_job(job['id'])
+            self.stats["succeeded"] += 1
+        finally:
+            lease.cancel()
+            self.running -= 1
+
+    async def _housekeeping(self):
+        while True:
+            try:
+                self.depth = await count_jobs(self.shard)
+                await purge_finished_jobs(JOB_RETENTION_HOURS * 3600)
+            except Exception as e:
+                logging.error(f"Job queue housekeeping failed: {e}")
+            await asyncio.sleep(HOUSEKEEPING_INTERVAL)
+
+    def snapshot(self) -> dict:
+        waits = sorted(w * 1000 for w in self._waits)
+        return {
+            **self.stats,
+            "shard": self.shard,
+            "shards": self.shards,
+            "running": self.running,
+            "depth": self.depth,
+            "p50_queue_wait_ms": round(percentile(waits, 0.5), 1) if waits else 0.0,
+            "p95_queue_wait_ms": round(percentile(waits, 0.95), 1) if waits else 0.0,
+        }
+
+
+job_runner = JobRunner()
+register_metrics("job_queue", job_runner.snapshot)
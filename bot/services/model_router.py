@@ -0,0 +1,56 @@
+from dataclasses import dataclass, field
+
+from config import GEMINI_MODEL, GEMINI_LIGHT_MODEL, GEMINI_STRONG_MODEL, GEMINI_ROUTES
+from bot.services.usage_tracker import usage_tracker
+from bot.utils.metrics import register_metrics
+
+
+@dataclass(frozen=True)
+class Route:
+    feature: str
+    model: str
+    max_input_chars: int | None = None
+    generation_config: dict = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        size = f"<={self.max_input_chars}" if self.max_input_chars else ""
+        return f"{self.feature}{size}:{self.model}"
+
+
+# Per feature, the first route whose max_input_chars fits the input wins.
+# Short lookups go to the light model; open-ended generation to the strong one.
+DEFAULT_ROUTES = {
+    "translate": [
+        {"max_input_chars": 300, "model": GEMINI_LIGHT_MODEL},
+        {"model": GEMINI_MODEL},
+    ],
+    "evaluate": [{"model": GEMINI_LIGHT_MODEL, "generation_config": {"max_output_tokens": 256}}],
+    "fact": [{"model": GEMINI_LIGHT_MODEL, "generation_config": {"max_output_tokens": 512}}],
+    "word": [{"model": GEMINI_LIGHT_MODEL}],
+    "quiz": [{"model": GEMINI_MODEL}],
+    "ocr": [{"model": GEMINI_MODEL}],
+    "concept": [{"model": GEMINI_STRONG_MODEL}],
+    "chat": [{"model": GEMINI_STRONG_MODEL}],
+    "roleplay": [{"model": GEMINI_STRONG_MODEL}],
+}
+
+
+class ModelRouter:
+    def __init__(self, table: dict):
+        self.routes = {
+            feature: [Route(feature=feature, **spec) for spec in specs]
+            for feature, specs in table.items()
+        }
+        self.default_route = Route(feature="default", model=GEMINI_MODEL)
+
+    def select(self, feature: str, input_chars: int = 0) -> Route:
+        for route in self.routes.get(feature, []):
+            if route.max_input_chars is None or input_chars <= route.max_input_chars:
+                return route
+        return self.default_route
+
+
+model_router = ModelRouter({**DEFAULT_ROUTES, **GEMINI_ROUTES})
+
+register_metrics("gemini_routes_1h", lambda: usage_tracker.aggregate(3600, group_by="route"))
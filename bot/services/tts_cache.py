@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES
+from bot.utils.metrics import register_metrics
+
+
+def normalize_tts_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def tts_cache_key(text: str, lang: str) -> str:
+    normalized = normalize_tts_text(text)
+    return hashlib.sha256(f"{lang}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class TtsCache:
+    # MP3 files named by content key. The in-memory index (key -> size, in LRU
+    # order) is rebuilt from file mtimes on first use, so eviction order
+    # survives restarts; hits bump the mtime.
+    def __init__(self, directory: str | Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._index: OrderedDict[str, int] | None = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "evictions": 0, "write_errors": 0}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.mp3"
+
+    def _load_index(self) -> OrderedDict[str, int]:
+        if self._index is not None:
+            return self._index
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for leftover in self.directory.glob("*.tmp"):
+            leftover.unlink(missing_ok=True)
+        files = []
+        for path in self.directory.glob("*.mp3"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        self._index = OrderedDict((key, size) for _mtime, key, size in sorted(files))
+        self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def _read(self, key: str) -> bytes | None:
+        with self._lock:
+            return self._read_locked(key)
+
+    def _write(self, key: str, data: bytes):
+        with self._lock:
+            self._write_locked(key, data)
+
+    def _read_locked(self, key: str) -> bytes | None:
+        index = self._load_index()
+        if key not in index:
+            return None
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            self._total_bytes -= index.pop(key)
+            return None
+        index.move_to_end(key)
+        return data
+
+    def _write_locked(self, key: str, data: bytes):
+        index = self._load_index()
+        # Write to a temp file in the same directory and rename, so readers
+        # never see a partial MP3.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._total_bytes += len(data) - index.get(key, 0)
+        index[key] = len(data)
+        index.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.stats["evictions"] += 1
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    async def get(self, text: str, lang: str) -> bytes | None:
+        try:
+            data = await asyncio.to_thread(self._read, tts_cache_key(text, lang))
+        except OSError as e:
+            logging.error(f"Could not read TTS cache: {e}")
+            data = None
+        if data is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.stats["bytes_saved"] += len(data)
+        return data
+
+    async def put(self, text: str, lang: str, data: bytes):
+        try:
+            await asyncio.to_thread(self._write, tts_cache_key(text, lang), data)
+        except OSError as e:
+            self.stats["write_errors"] += 1
+            logging.error(f"Could not write TTS cache entry: {e}")
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._index) if self._index is not None else None,
+            "bytes": self._total_bytes,
+        }
+
+
+tts_cache = TtsCache()
+
+register_metrics("tts_cache", tts_cache.snapshot)
@@ -0,0 +1,78 @@
+import asyncio
+
+from config import TTS_SPECULATIVE_TTL
+from bot.services.tts_service import synthesize_speech, TtsBusyError, SPECULATIVE
+from bot.utils.metrics import register_metrics
+
+
+class SpeculativeTts:
+    # One short-lived slot per user holding background synthesis of the clips
+    # they are likely to request next. Starting a new slot, leaving the TTS
+    # menu or the TTL running out cancels whatever is still in flight.
+    def __init__(self, ttl: float = TTS_SPECULATIVE_TTL):
+        self.ttl = ttl
+        self._slots: dict[int, dict[tuple[str, str], asyncio.Task]] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self.stats = {"started": 0, "used": 0, "cancelled": 0, "expired": 0, "skipped_busy": 0}
+
+    async def _run(self, text: str, lang: str) -> bytes | None:
+        try:
+            return await synthesize_speech(text, lang, priority=SPECULATIVE)
+        except TtsBusyError:
+            self.stats["skipped_busy"] += 1
+            return None
+
+    def start(self, user_id: int, clips: list[tuple[str, str]]):
+        self.cancel(user_id)
+        slot = {}
+        for text, lang in clips:
+            if text and lang and (text, lang) not in slot:
+                slot[(text, lang)] = asyncio.create_task(self._run(text, lang))
+        if not slot:
+            return
+        self._slots[user_id] = slot
+        self._timers[user_id] = asyncio.get_running_loop().call_later(self.ttl, self._expire, user_id)
+        self.stats["started"] += len(slot)
+
+    def has(self, user_id: int) -> bool:
+        return user_id in self._slots
+
+    def is_ready(self, user_id: int, text: str, lang: str) -> bool:
+        task = self._slots.get(user_id, {}).get((text, lang))
+        return bool(task and task.done() and not task.cancelled() and task.result())
+
+    async def take(self, user_id: int, text: str, lang: str) -> bytes | None:
+        task = self._slots.get(user_id, {}).get((text, lang))
+        if task is None:
+            return None
+        try:
+            audio = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            raise
+        if audio:
+            self.stats["used"] += 1
+        return audio
+
+    def cancel(self, user_id: int):
+        timer = self._timers.pop(user_id, None)
+        if timer:
+            timer.cancel()
+        for task in self._slots.pop(user_id, {}).values():
+            if not task.done():
+                task.cancel()
+                self.stats["cancelled"] += 1
+
+    def _expire(self, user_id: int):
+        self._timers.pop(user_id, None)
+        self.stats["expired"] += 1
+        self.cancel(user_id)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "active_slots": len(self._slots)}
+
+
+speculative_tts = SpeculativeTts()
+
+register_metrics("tts_speculative", speculative_tts.snapshot)
@@ -1,33 +1,201 @@
-import io
 import asyncio
+import base64
+import io
 import logging
-from gtts import gTTS
-from aiogram.types import BufferedInputFile
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import TTS_WORKERS, TTS_MAX_PENDING, TTS_SEGMENT_CHARS
+from bot.services.tts_cache import tts_cache
+from bot.services.usage_tracker import percentile
+from bot.utils.metrics import register_metrics
+from bot.utils.text_utils import split_sentences
+from bot.utils.http import requests_session
+
+
+class TtsBusyError(Exception):
+    pass
+
+
+# Queue priorities: a user waiting on a tap always goes before speculative work.
+INTERACTIVE = 0
+SPECULATIVE = 1
+
+
+_GTTS_AUDIO = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+# gTTS releases whose request format _synthesize_pooled() mirrors. Any other
+# version, or a response it can't read, goes through the public API.
+_POOLED_GTTS_VERSIONS = ("2.5.",)
+_pooled_enabled = True
+
+
+class _PooledFormatError(Exception):
+    pass
+
+
+def _synthesize_pooled(tts) -> bytes:
+    # Same requests and parsing as gTTS.stream(), but sent through the shared
+    # pooled session: gTTS opens a new Session (and TLS connection) for
+    # every request.
+    from gtts.tts import gTTSError
+
+    session = requests_session()
+    audio = bytearray()
+    for request in tts._prepare_requests():
+        response = session.send(request, timeout=tts.timeout)
+        if not response.ok:
+            raise gTTSError(tts=tts, response=response)
+        found = False
+        for line in response.iter_lines(chunk_size=1024):
+            decoded = line.decode("utf-8")
+            if "jQ1olc" not in decoded:
+                continue
+            match = _GTTS_AUDIO.search(decoded)
+            if not match:
+                raise _PooledFormatError("audio line without audio")
+            audio += base64.b64decode(match.group(1).encode("ascii"))
+            found = True
+        if not found:
+            raise _PooledFormatError("no audio in response")
+    return bytes(audio)
+
+
+def _synthesize_blocking(text: str, lang: str) -> bytes:
+    global _pooled_enabled
+    from gtts import gTTS, __version__ as gtts_version
+
+    tts = gTTS(text=text, lang=lang, slow=False)
+    if _pooled_enabled and gtts_version.startswith(_POOLED_GTTS_VERSIONS):
+        try:
+            return _synthesize_pooled(tts)
+        except (_PooledFormatError, AttributeError) as e:
+            _pooled_enabled = False
+            logging.warning(f"Pooled gTTS requests don't match gTTS {gtts_version} ({e}); using gTTS directly")
+
+    audio = io.BytesIO()
+    tts.write_to_fp(audio)
+    return audio.getvalue()
 
-async def text_to_speech_file(
-    text: str, lang: str = 'en'
-) -> BufferedInputFile | None:
+
+class TtsWorkerPool:
+    # gTTS runs on its own threads instead of the default executor. Work is
+    # queued per sentence segment and refused once `max_pending` segments are
+    # waiting, so a burst of long texts cannot pile up unbounded.
+    def __init__(self, workers: int = TTS_WORKERS, max_pending: int = TTS_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        self._queue: asyncio.Queue | None = None
+        self._tasks = []
+        self._timings = deque(maxlen=1000)
+        self._sequence = 0
+        self.stats = {"jobs": 0, "segments": 0, "busy_rejections": 0, "failures": 0, "cancelled": 0}
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _priority, _sequence, text, lang, future, enqueued_at = await self._queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                started = time.perf_counter()
+                try:
+                    audio = await loop.run_in_executor(self._executor, _synthesize_blocking, text, lang)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result((audio, started - enqueued_at, time.perf_counter() - started))
+            finally:
+                self.pending -= 1
+                self._queue.task_done()
+
+    async def synthesize(self, text: str, lang: str, priority: int = INTERACTIVE) -> bytes:
+        # Long texts are split at sentence boundaries and the segments are
+        # synthesized in parallel; MP3 frames concatenate into one clip.
+        segments = [s.strip() for s in split_sentences(text, TTS_SEGMENT_CHARS) if s.strip()]
+        # Speculative work only runs while at least half the queue is free.
+        limit = self.max_pending if priority == INTERACTIVE else self.max_pending // 2
+        if self.pending + len(segments) > limit:
+            self.stats["busy_rejections"] += 1
+            raise TtsBusyError(f"{self.pending} TTS segments already queued")
+
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        futures = []
+        for segment in segments:
+            future = loop.create_future()
+            futures.append(future)
+            self.pending += 1
+            self._sequence += 1
+            self._queue.put_nowait((priority, self._sequence, segment, lang, future, started))
+        try:
+            results = await asyncio.gather(*futures)
+        except BaseException as e:
+            for future in futures:
+                future.cancel()
+            self.stats["cancelled" if isinstance(e, asyncio.CancelledError) else "failures"] += 1
+            raise
+
+        self.stats["jobs"] += 1
+        self.stats["segments"] += len(segments)
+        self._timings.append((
+            max(wait for _audio, wait, _synth in results),
+            sum(synth for _audio, _wait, synth in results),
+            time.perf_counter() - started,
+            len(segments),
+        ))
+        return b"".join(audio for audio, _wait, _synth in results)
+
+    def snapshot(self) -> dict:
+        snapshot = {
+            **self.stats,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+        }
+        if not self._timings:
+            return snapshot
+        waits = sorted(t[0] * 1000 for t in self._timings)
+        totals = sorted(t[2] * 1000 for t in self._timings)
+        jobs = len(self._timings)
+        snapshot.update(
+            avg_segments=round(sum(t[3] for t in self._timings) / jobs, 2),
+            avg_synth_ms=round(sum(t[1] for t in self._timings) * 1000 / jobs, 1),
+            p95_queue_wait_ms=round(percentile(waits, 0.95), 1),
+            p50_total_ms=round(percentile(totals, 0.5), 1),
+            p95_total_ms=round(percentile(totals, 0.95), 1),
+        )
+        return snapshot
+
+
+tts_pool = TtsWorkerPool()
+
+register_metrics("tts_pool", tts_pool.snapshot)
+
+
+async def synthesize_speech(text: str, lang: str = 'en', priority: int = INTERACTIVE) -> bytes | None:
     if not text:
         return None
+    cached = await tts_cache.get(text, lang)
+    if cached:
+        return cached
     try:
-        loop = asyncio.get_event_loop()
-        mp3_fp = io.BytesIO()
-
-        def blocking_tts_task():
-            try:
-                tts = gTTS(text=text, lang=lang, slow=False)
-                tts.write_to_fp(mp3_fp)
-                mp3_fp.seek(0)
-                return True
-            except Exception as e_tts:
-                logging.error(f"gTTS error for lang '{lang}': {e_tts}")
-                return False
-
-        success = await loop.run_in_executor(None, blocking_tts_task)
-        if not success:
-            return None
-
-        return BufferedInputFile(mp3_fp.read(), filename="speech.mp3")
+        audio = await tts_pool.synthesize(text, lang, priority)
+    except TtsBusyError:
+        raise
     except Exception as e:
-        logging.error(f"Error in text_to_speech_file: {e}")
-        return None
\ No newline at end of file
+        logging.error(f"gTTS error for lang '{lang}': {e}")
+        return None
+
+    await tts_cache.put(text, lang, audio)
+    return audio
@@ -0,0 +1,95 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from config import GEMINI_PRICING, GEMINI_USAGE_RETENTION_HOURS, GEMINI_USAGE_MAX_RECORDS
+from bot.utils.metrics import register_metrics
+
+def percentile(sorted_values: list, q: float):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+@dataclass(frozen=True)
+class CallRecord:
+    timestamp: float
+    feature: str
+    user_id: int | None
+    model: str
+    input_tokens: int
+    output_tokens: int
+    latency: float
+    retries: int
+    outcome: str
+    route: str = ""
+
+    @property
+    def cost(self) -> float:
+        input_price, output_price = GEMINI_PRICING.get(self.model, (0.0, 0.0))
+        return (
+            self.input_tokens * input_price + self.output_tokens * output_price
+        ) / 1_000_000
+
+
+class UsageTracker:
+    def __init__(
+        self, retention: float = GEMINI_USAGE_RETENTION_HOURS * 3600,
+        max_records: int = GEMINI_USAGE_MAX_RECORDS
+    ):
+        self.retention = retention
+        self.records = deque(maxlen=max_records)
+
+    def record(
+        self, feature: str, user_id: int | None, model: str, usage: dict,
+        latency: float, retries: int = 0, outcome: str = "ok", route: str = ""
+    ):
+        now = time.time()
+        self.records.append(CallRecord(
+            timestamp=now,
+            feature=feature,
+            user_id=user_id,
+            model=model,
+            input_tokens=usage.get("input_tokens") or 0,
+            output_tokens=usage.get("output_tokens") or 0,
+            latency=latency,
+            retries=retries,
+            outcome=outcome,
+            route=route,
+        ))
+        while self.records and self.records[0].timestamp < now - self.retention:
+            self.records.popleft()
+
+    def aggregate(self, window: float, group_by: str = "feature") -> dict:
+        since = time.time() - window
+        groups = {}
+        for record in reversed(self.records):
+            if record.timestamp < since:
+                break
+            groups.setdefault(getattr(record, group_by), []).append(record)
+
+        summary = {}
+        for key, records in groups.items():
+            latencies = sorted(r.latency for r in records)
+            summary[key] = {
+                "calls": len(records),
+                "errors": sum(r.outcome != "ok" for r in records),
+                "retries": sum(1 for r in records if r.retries),
+                "input_tokens": sum(r.input_tokens for r in records),
+                "output_tokens": sum(r.output_tokens for r in records),
+                "cost_usd": round(sum(r.cost for r in records), 6),
+                "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+                "p95_latency_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            }
+        return summary
+
+    def top_users(self, window: float, limit: int = 10) -> list[tuple[int, dict]]:
+        per_user = self.aggregate(window, group_by="user_id")
+        per_user.pop(None, None)
+        return sorted(
+            per_user.items(),
+            key=lambda item: item[1]["input_tokens"] + item[1]["output_tokens"],
+            reverse=True
+        )[:limit]
+
+
+usage_tracker = UsageTracker()
+register_metrics("gemini_usage_1h", lambda: usage_tracker.aggregate(3600))
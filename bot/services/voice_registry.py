@@ -0,0 +1,35 @@
+import hashlib
+import logging
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, Message
+
+from database.db_utils import get_voice_file_id, save_voice_file_id, delete_voice_file_id
+from bot.utils.metrics import register_metrics
+
+voice_stats = {"reused": 0, "uploaded": 0, "stale": 0, "bytes_uploaded": 0, "bytes_saved": 0}
+
+
+async def send_voice_clip(message: Message, audio: bytes, **kwargs) -> Message:
+    # Telegram keeps every uploaded file; re-sending by file_id skips the upload.
+    content_hash = hashlib.sha256(audio).hexdigest()
+    file_id = await get_voice_file_id(content_hash)
+    if file_id:
+        try:
+            sent = await message.answer_voice(file_id, **kwargs)
+            voice_stats["reused"] += 1
+            voice_stats["bytes_saved"] += len(audio)
+            return sent
+        except TelegramBadRequest as e:
+            logging.warning(f"Stored voice file_id rejected, uploading again: {e}")
+            voice_stats["stale"] += 1
+            await delete_voice_file_id(content_hash)
+
+    sent = await message.answer_voice(BufferedInputFile(audio, filename="speech.mp3"), **kwargs)
+    voice_stats["uploaded"] += 1
+    voice_stats["bytes_uploaded"] += len(audio)
+    if sent.voice:
+        await save_voice_file_id(content_hash, sent.voice.file_id)
+    return sent
+
+
+register_metrics("voice_file_ids", lambda: dict(voice_stats))
@@ -0,0 +1,333 @@
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing as mp
+import queue
+import time
+from dataclasses import dataclass
+
+import aiohttp
+from aiohttp import web
+
+from config import (
+    TELEGRAM_TOKEN, TELEGRAM_API_URL, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBAPP_HOST, WEBAPP_PORT, WORKER_QUEUE_SIZE, WORKER_HEALTH_INTERVAL,
+    WORKER_HEARTBEAT_TIMEOUT, WORKER_STARTUP_GRACE
+)
+from bot.utils.http import client_session
+
+DEFAULT_DISPATCHER_FACTORY = "bot.app:create_dispatcher"
+POLL_TIMEOUT = 30
+
+
+def update_user_id(update: dict) -> int | None:
+    # The payload is the one non-update_id key: message, callback_query, ...
+    for key, payload in update.items():
+        if key == "update_id" or not isinstance(payload, dict):
+            continue
+        for field_name in ("from", "user"):
+            if isinstance(payload.get(field_name), dict):
+                return payload[field_name].get("id")
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if isinstance(chat, dict):
+            return chat.get("id")
+    return None
+
+
+def shard_for(update: dict, workers: int) -> int:
+    # Same user -> same worker, so FSM state and in-process caches stay valid.
+    user_id = update_user_id(update)
+    return user_id % workers if user_id is not None else 0
+
+
+# --- Worker process -----------------------------------------------------------
+
+def _worker_main(index: int, updates: mp.Queue, heartbeat, processed, factory_path: str):
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - %(levelname)s - worker-{index} - %(name)s - %(message)s",
+    )
+    try:
+        asyncio.run(_worker_loop(index, updates, heartbeat, processed, factory_path))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_loop(index: int, updates: mp.Queue, heartbeat, processed, factory_path: str):
+    from bot.app import create_bot
+    from bot.services.job_queue import job_runner
+
+    module_name, factory_name = factory_path.split(":")
+    create_dispatcher = getattr(importlib.import_module(module_name), factory_name)
+    bot = create_bot()
+    dp = create_dispatcher(bot)
+    # Jobs are sharded like updates, so a job runs where its user's FSM state is.
+    job_runner.shard = index
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    async def beat():
+        # Stops if the event loop is blocked, which is what the supervisor watches.
+        while True:
+            heartbeat.value = time.time()
+            await asyncio.sleep(1)
+
+    async def handle(update: dict):
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception:
+            logging.exception(f"Worker {index} failed to handle update {update.get('update_id')}")
+        finally:
+            with processed.get_lock():
+                processed.value += 1
+
+    loop = asyncio.get_running_loop()
+    beat_task = asyncio.create_task(beat())
+    tasks = set()
+    try:
+        while True:
+            try:
+                raw = await loop.run_in_executor(None, updates.get, True, 1.0)
+            except queue.Empty:
+                continue
+            if raw is None:
+                break
+            task = asyncio.create_task(handle(json.loads(raw)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        beat_task.cancel()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+
+
+# --- Supervisor ---------------------------------------------------------------
+
+@dataclass
+class WorkerHandle:
+    index: int
+    updates: mp.Queue
+    heartbeat: object
+    processed: object
+    process: mp.Process | None = None
+    restarts: int = 0
+    started_at: float = 0.0
+    restart_at: float | None = None
+    last_failure: str = ""
+    dispatched: int = 0
+    dropped: int = 0
+
+
+class Supervisor:
+    def __init__(self, workers: int, factory_path: str = DEFAULT_DISPATCHER_FACTORY):
+        self._ctx = mp.get_context("spawn")
+        self.factory_path = factory_path
+        self.workers = [
+            WorkerHandle(
+                index=i,
+                updates=self._ctx.Queue(WORKER_QUEUE_SIZE),
+                heartbeat=self._ctx.Value("d", 0.0),
+                processed=self._ctx.Value("L", 0),
+            )
+            for i in range(workers)
+        ]
+        self._monitor_task: asyncio.Task | None = None
+
+    def _replace_queue(self, handle: WorkerHandle):
+        # A worker killed inside updates.get() dies holding the queue's reader
+        # lock, and a restarted worker on that queue would never get another
+        # update. Every worker process gets a fresh queue; what was still
+        # buffered in the old one is lost with the worker.
+        old = handle.updates
+        handle.updates = self._ctx.Queue(WORKER_QUEUE_SIZE)
+        try:
+            lost = old.qsize()
+        except NotImplementedError:
+            lost = 0
+        old.cancel_join_thread()
+        old.close()
+        if lost:
+            handle.dropped += lost
+            logging.error(f"Dropped {lost} updates queued for worker {handle.index}")
+
+    def _spawn(self, handle: WorkerHandle):
+        if handle.process is not None:
+            self._replace_queue(handle)
+        # Workers import the whole bot before their first heartbeat.
+        handle.heartbeat.value = time.time() + WORKER_STARTUP_GRACE
+        handle.process = self._ctx.Process(
+            target=_worker_main,
+            args=(handle.index, handle.updates, handle.heartbeat, handle.processed, self.factory_path),
+            name=f"bot-worker-{handle.index}",
+            daemon=True,
+        )
+        handle.process.start()
+        handle.started_at = time.time()
+        handle.restart_at = None
+        logging.info(f"Started worker {handle.index} (pid {handle.process.pid})")
+
+    def start(self):
+        for handle in self.workers:
+            self._spawn(handle)
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def dispatch(self, update: dict):
+        handle = self.workers[shard_for(update, len(self.workers))]
+        raw = json.dumps(update)
+        while True:
+            # Looked up on every try: a restarted worker has a new queue.
+            updates = handle.updates
+            try:
+                updates.put_nowait(raw)
+                break
+            except queue.Full:
+                pass
+            # Backpressure: the receiver stops taking updates until this
+            # worker catches up.
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, updates.put, raw, True, 1.0)
+                break
+            except queue.Full:
+                continue
+        handle.dispatched += 1
+
+    def _check(self, handle: WorkerHandle) -> str | None:
+        if not handle.process.is_alive():
+            return f"exited with code {handle.process.exitcode}"
+        if time.time() - handle.heartbeat.value > WORKER_HEARTBEAT_TIMEOUT:
+            handle.process.kill()
+            handle.process.join(5)
+            return "missed heartbeats"
+        return None
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(WORKER_HEALTH_INTERVAL)
+            now = time.time()
+            for handle in self.workers:
+                if handle.restart_at is not None:
+                    if now >= handle.restart_at:
+                        self._spawn(handle)
+                    continue
+                failure = self._check(handle)
+                if not failure:
+                    continue
+                # Back off when a worker keeps crashing right after start.
+                crashed_fast = now - handle.started_at < 60
+                delay = min(30, 2 ** min(handle.restarts, 5)) if crashed_fast else 0
+                handle.restarts += 1
+                handle.last_failure = failure
+                handle.restart_at = now + delay
+                logging.error(f"Worker {handle.index} {failure}; restarting in {delay}s")
+
+    def health(self) -> dict:
+        now = time.time()
+        workers = []
+        for handle in self.workers:
+            workers.append({
+                "index": handle.index,
+                "pid": handle.process.pid if handle.process else None,
+                "alive": bool(handle.process and handle.process.is_alive()),
+                "heartbeat_age_s": round(max(0.0, now - handle.heartbeat.value), 1),
+                "restarts": handle.restarts,
+                "last_failure": handle.last_failure,
+                "dispatched": handle.dispatched,
+                "dropped": handle.dropped,
+                "processed": handle.processed.value,
+            })
+        return {"status": "ok" if all(w["alive"] for w in workers) else "degraded", "workers": workers}
+
+    async def stop(self, timeout: float = 10):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        for handle in self.workers:
+            if handle.process and handle.process.is_alive():
+                handle.updates.put(None)
+        deadline = time.time() + timeout
+        for handle in self.workers:
+            if handle.process:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, handle.process.join, max(0.0, deadline - time.time())
+                )
+                if handle.process.is_alive():
+                    handle.process.terminate()
+
+
+# --- Receivers ------------------------------------------------------------------
+
+async def _call_api(http: aiohttp.ClientSession, api_base: str, method: str, **params) -> dict:
+    data = {k: json.dumps(v) if isinstance(v, bool) else str(v) for k, v in params.items()}
+    async with http.post(f"{api_base}/{method}", data=data) as response:
+        return await response.json()
+
+
+async def poll_updates(supervisor: Supervisor, api_url: str = TELEGRAM_API_URL, token: str = TELEGRAM_TOKEN):
+    # Only long-polls and routes raw JSON; parsing into aiogram models happens
+    # in the workers.
+    api_base = f"{api_url}/bot{token}"
+    offset = None
+    timeout = aiohttp.ClientTimeout(total=POLL_TIMEOUT + 15)
+    async with client_session("receiver", timeout=timeout) as http:
+        await _call_api(http, api_base, "deleteWebhook", drop_pending_updates=True)
+        while True:
+            params = {"timeout": POLL_TIMEOUT}
+            if offset is not None:
+                params["offset"] = offset
+            try:
+                payload = await _call_api(http, api_base, "getUpdates", **params)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"getUpdates failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not payload.get("ok"):
+                retry_after = payload.get("parameters", {}).get("retry_after", 1)
+                logging.warning(f"getUpdates error: {payload.get('description')}")
+                await asyncio.sleep(retry_after)
+                continue
+            for update in payload["result"]:
+                await supervisor.dispatch(update)
+                offset = update["update_id"] + 1
+
+
+def build_receiver_app(supervisor: Supervisor, receive_updates: bool) -> web.Application:
+    app = web.Application()
+
+    async def health(request: web.Request) -> web.Response:
+        status = supervisor.health()
+        return web.json_response(status, status=200 if status["status"] == "ok" else 503)
+
+    async def webhook(request: web.Request) -> web.Response:
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        await supervisor.dispatch(await request.json())
+        return web.Response()
+
+    app.router.add_get("/health", health)
+    if receive_updates:
+        app.router.add_post(WEBHOOK_PATH, webhook)
+    return app
+
+
+async def run_supervisor(workers: int, mode: str, factory_path: str = DEFAULT_DISPATCHER_FACTORY):
+    if mode == "webhook" and not WEBHOOK_URL.startswith("https://"):
+        raise ValueError("BOT_MODE=webhook needs WEBHOOK_BASE_URL set to a public https:// URL")
+    supervisor = Supervisor(workers, factory_path)
+    supervisor.start()
+    runner = web.AppRunner(build_receiver_app(supervisor, receive_updates=mode == "webhook"))
+    await runner.setup()
+    await web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT).start()
+    logging.info(f"Supervisor running {workers} workers ({mode}); health on {WEBAPP_HOST}:{WEBAPP_PORT}/health")
+    try:
+        if mode == "webhook":
+            async with client_session("receiver") as http:
+                await _call_api(
+                    http, f"{TELEGRAM_API_URL}/bot{TELEGRAM_TOKEN}", "setWebhook",
+                    url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET
+                )
+            await asyncio.Event().wait()
+        else:
+            await poll_updates(supervisor)
+    finally:
+        await runner.cleanup()
+        await supervisor.stop()
@@ -0,0 +1,125 @@
+import threading
+
+import aiohttp
+from aiohttp import hdrs
+from aiogram import __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+
+from config import (
+    PROXY_URL, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE, HTTP_DNS_TTL,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, TTS_WORKERS
+)
+from bot.utils.metrics import register_metrics
+
+# New vs. reused pooled connections, per client; churn shows up as "created"
+# growing with traffic.
+connection_stats: dict[str, dict[str, int]] = {}
+
+
+def _trace(name: str) -> aiohttp.TraceConfig:
+    stats = connection_stats.setdefault(name, {"created": 0, "reused": 0, "requests": 0})
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        stats["requests"] += 1
+
+    async def on_connection_create_end(session, context, params):
+        stats["created"] += 1
+
+    async def on_connection_reuseconn(session, context, params):
+        stats["reused"] += 1
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    trace.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace
+
+
+def _connector_kwargs() -> dict:
+    return {
+        "limit": HTTP_POOL_LIMIT,
+        "limit_per_host": HTTP_POOL_LIMIT_PER_HOST,
+        "keepalive_timeout": HTTP_KEEPALIVE,
+        "ttl_dns_cache": HTTP_DNS_TTL,
+    }
+
+
+class TunedAiohttpSession(AiohttpSession):
+    # aiogram's session with our pool limits, keep-alive and DNS cache,
+    # connect/read timeouts, and an explicit HTTP proxy instead of HTTPS_PROXY
+    # from the environment (which aiogram never read anyway).
+    def __init__(self, proxy: str | None = PROXY_URL, **kwargs):
+        super().__init__(**kwargs)
+        self._connector_init.update(_connector_kwargs())
+        self._http_proxy = proxy
+
+    def _client_timeout(self, timeout: float | None) -> aiohttp.ClientTimeout:
+        # aiogram passes a bare number, which aiohttp turns into a total-only
+        # timeout. A request with its own timeout (getUpdates long polling)
+        # legitimately waits longer than HTTP_READ_TIMEOUT for an answer.
+        return aiohttp.ClientTimeout(
+            total=self.timeout if timeout is None else timeout,
+            connect=HTTP_CONNECT_TIMEOUT,
+            sock_read=HTTP_READ_TIMEOUT if timeout is None else None,
+        )
+
+    async def make_request(self, bot, method, timeout: int | None = None):
+        return await super().make_request(bot, method, timeout=self._client_timeout(timeout))
+
+    async def create_session(self) -> aiohttp.ClientSession:
+        if self._should_reset_connector:
+            await self.close()
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={hdrs.USER_AGENT: f"aiogram/{aiogram_version}"},
+                proxy=self._http_proxy,
+                trace_configs=[_trace("telegram")],
+            )
+            self._should_reset_connector = False
+        return self._session
+
+
+def client_session(name: str, **kwargs) -> aiohttp.ClientSession:
+    # Plain aiohttp session with the same tuning, for HTTP outside aiogram.
+    kwargs.setdefault("timeout", aiohttp.ClientTimeout(
+        total=None, connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT
+    ))
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(**_connector_kwargs()),
+        proxy=PROXY_URL,
+        trace_configs=[_trace(name)],
+        **kwargs,
+    )
+
+
+_requests_session = None
+_requests_lock = threading.Lock()
+
+
+def requests_session():
+    # One pooled requests.Session shared by the blocking clients (gTTS). Its
+    # pool is sized for the TTS threads so none of them opens a throwaway
+    # connection.
+    global _requests_session
+    if _requests_session is None:
+        with _requests_lock:
+            if _requests_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(TTS_WORKERS, 4))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                if PROXY_URL:
+                    session.proxies = {"http": PROXY_URL, "https": PROXY_URL}
+                _requests_session = session
+    return _requests_session
+
+
+def snapshot() -> dict:
+    return {name: dict(stats) for name, stats in connection_stats.items()}
+
+
+register_metrics("http_connections", snapshot)
@@ -1,7 +1,22 @@
 import logging
+import time
 from aiogram.types import Message
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.enums import ParseMode
+from aiogram.enums import ParseMode, ChatAction
+from aiogram.utils.chat_action import ChatActionSender
+from bot.middlewares.send_scheduler import bulk_sends
+
+# Work that finishes faster than this shows no indicator at all.
+CHAT_ACTION_DELAY = 0.3
+
+def chat_action(message: Message, action: str = ChatAction.TYPING) -> ChatActionSender:
+    # "typing..." / "sending voice..." in the chat header while a slow call
+    # runs, refreshed every 5s. Replaces placeholder messages, which cost a
+    # send and a delete per request.
+    return ChatActionSender(
+        bot=message.bot, chat_id=message.chat.id, message_thread_id=message.message_thread_id,
+        action=action, initial_sleep=CHAT_ACTION_DELAY
+    )
 
 async def send_safe_html(message: Message, text: str, **kwargs):
     try:
@@ -27,4 +42,29 @@ async def edit_safe_html(message: Message, text: str, **kwargs):
         elif "message is not modified" in e.message:
             logging.info("Message not modified, skipping edit.")
         else:
-            raise e
\ No newline at end of file
+            raise e
+
+
+class ProgressMessage:
+    # Edits one status message in place, at most once per `interval` seconds.
+    def __init__(self, message: Message, interval: float):
+        self.message = message
+        self.interval = interval
+        self._last_text = message.text
+        self._last_edit = 0.0
+
+    async def update(self, text: str, force: bool = False):
+        now = time.monotonic()
+        if text == self._last_text or (not force and now - self._last_edit < self.interval):
+            return
+        self._last_text, self._last_edit = text, now
+        try:
+            # Intermediate progress yields to other users' replies; the final
+            # (forced) update does not.
+            if force:
+                await edit_safe_html(self.message, text)
+            else:
+                with bulk_sends():
+                    await edit_safe_html(self.message, text)
+        except TelegramBadRequest as e:
+            logging.warning(f"Could not update progress message: {e}")
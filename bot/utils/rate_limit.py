@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    # Refills `rate` tokens per second up to `capacity`. Waiters are served in
+    # arrival order because they queue on the lock.
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        self.acquired += 1
+        return True
+
+    def delay(self, tokens: float = 1.0) -> float:
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        started = time.monotonic()
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.delay(tokens))
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.waited += 1
+            self.total_wait += waited
+        return waited
+
+    def snapshot(self) -> dict:
+        self._refill()
+        return {
+            "rate_per_s": self.rate,
+            "capacity": self.capacity,
+            "available": round(self._tokens, 2),
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "total_wait_s": round(self.total_wait, 3),
+        }
@@ -0,0 +1,49 @@
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = []
+        self.first_update_at = None
+
+    @contextmanager
+    def stage(self, name: str):
+        modules_before = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((
+                name, time.perf_counter() - started,
+                len(sys.modules) - modules_before
+            ))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def report(self):
+        lines = [f"Startup finished in {self.elapsed() * 1000:.0f} ms:"]
+        for name, duration, modules in self.stages:
+            lines.append(f"  {name:<24}{duration * 1000:>8.0f} ms  (+{modules} modules)")
+        logging.info("\n".join(lines))
+
+    async def first_update_middleware(self, handler, event, data):
+        if self.first_update_at is not None:
+            return await handler(event, data)
+
+        self.first_update_at = self.elapsed()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            logging.info(
+                f"Time to first update: {self.first_update_at * 1000:.0f} ms "
+                f"(handled in {(time.perf_counter() - started) * 1000:.0f} ms)"
+            )
+
+
+startup_profiler = StartupProfiler()
@@ -0,0 +1,31 @@
+import re
+from typing import Iterator
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?。！？])(\s+)")
+
+
+def split_sentences(text: str, max_chars: int) -> Iterator[str]:
+    # Packs whole sentences (with the whitespace after them) into pieces of at
+    # most max_chars; joining the pieces gives back the original text.
+    if len(text) <= max_chars:
+        yield text
+        return
+
+    parts = SENTENCE_BREAK.split(text)
+    sentences = [parts[i] + (parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+    current = ""
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut + 1 if cut > 0 else max_chars
+            if current:
+                yield current
+                current = ""
+            yield sentence[:cut]
+            sentence = sentence[cut:]
+        if current and len(current) + len(sentence) > max_chars:
+            yield current
+            current = ""
+        current += sentence
+    if current:
+        yield current
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT
+from bot.utils.metrics import register_metrics
+
+
+class WebhookStats:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.in_flight = 0
+        self.handled = 0
+        self.failed = 0
+
+    async def middleware(self, handler, event, data):
+        self.in_flight += 1
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.handled += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "updates_in_flight": self.in_flight,
+            "updates_handled": self.handled,
+            "updates_failed": self.failed,
+        }
+
+
+webhook_stats = WebhookStats()
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", **webhook_stats.snapshot()})
+
+
+def build_webhook_app(
+    bot: Bot, dp: Dispatcher, path: str = WEBHOOK_PATH,
+    secret_token: str | None = WEBHOOK_SECRET, webhook_url: str | None = WEBHOOK_URL
+) -> web.Application:
+    # Telegram gets its 200 as soon as the update is parsed; handlers run as
+    # background tasks, so slow Gemini calls never cause webhook retries.
+    dp.update.outer_middleware(webhook_stats.middleware)
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp, bot=bot, handle_in_background=True, secret_token=secret_token
+    ).register(app, path=path)
+    app.router.add_get("/health", health)
+    setup_application(app, dp, bot=bot)
+
+    if webhook_url:
+        async def register_webhook(app: web.Application):
+            await bot.set_webhook(
+                url=webhook_url,
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+            logging.info(f"Webhook registered at {webhook_url}")
+        app.on_startup.append(register_webhook)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, host: str = WEBAPP_HOST, port: int = WEBAPP_PORT):
+    if not WEBHOOK_URL.startswith("https://"):
+        raise ValueError("BOT_MODE=webhook needs WEBHOOK_BASE_URL set to a public https:// URL")
+    runner = web.AppRunner(build_webhook_app(bot, dp))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Webhook server listening on {host}:{port}{WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+register_metrics("webhook", webhook_stats.snapshot)
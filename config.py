@@ -1,5 +1,7 @@
 #
 import os
+import json
+import hashlib
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -8,6 +10,181 @@ PA_USERNAME = "8Khumaryan8"
 DB_FULL_PATH = f"/home/{PA_USERNAME}/Arvion_Lingua_AI/Arvion_Lingua_AI/lingua_ai_bot.db"
 DB_NAME = os.getenv("DATABASE_NAME", DB_FULL_PATH)
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_LIGHT_MODEL = os.getenv("GEMINI_LIGHT_MODEL", "gemini-1.5-flash-8b")
+GEMINI_STRONG_MODEL = os.getenv("GEMINI_STRONG_MODEL", GEMINI_MODEL)
+# Per-feature overrides of the routing table in bot/services/model_router.py, e.g.
+# {"translate": [{"max_input_chars": 100, "model": "gemini-1.5-flash-8b"}, {"model": "gemini-1.5-flash"}]}
+GEMINI_ROUTES = json.loads(os.getenv("GEMINI_ROUTES", "{}"))
+
+# "google" talks to the real API; "fake" is an offline stand-in for local
+# runs and load tests (see bot/services/gemini_backends.py).
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "google")
+FAKE_GEMINI_LATENCY = os.getenv("FAKE_GEMINI_LATENCY", "lognormal:800:0.4")
+FAKE_GEMINI_ERROR_RATE = float(os.getenv("FAKE_GEMINI_ERROR_RATE", "0"))
+FAKE_GEMINI_TOKENS_PER_SECOND = float(os.getenv("FAKE_GEMINI_TOKENS_PER_SECOND", "0"))
+FAKE_GEMINI_FIXTURES = os.getenv("FAKE_GEMINI_FIXTURES")
+FAKE_GEMINI_SEED = int(os.getenv("FAKE_GEMINI_SEED")) if os.getenv("FAKE_GEMINI_SEED") else None
+
+# USD per 1M tokens as [input, output], used for per-call cost accounting.
+GEMINI_PRICING = json.loads(os.getenv(
+    "GEMINI_PRICING",
+    '{"gemini-1.5-flash": [0.075, 0.30], "gemini-1.5-flash-8b": [0.0375, 0.15], '
+    '"gemini-1.5-pro": [1.25, 5.00]}'
+))
+GEMINI_USAGE_RETENTION_HOURS = float(os.getenv("GEMINI_USAGE_RETENTION_HOURS", "24"))
+GEMINI_USAGE_MAX_RECORDS = int(os.getenv("GEMINI_USAGE_MAX_RECORDS", "100000"))
+# Limits for upstream calls, shared by every feature. They apply to the whole
+# bot: with BOT_WORKERS > 1 each worker process gets an equal share.
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "600"))
+GEMINI_BURST = float(os.getenv("GEMINI_BURST", "20"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+
+# Photo translation: pick the smallest Telegram size whose longer side reaches
+# IMAGE_OCR_TARGET_SIDE, then downscale/re-encode before sending it to Gemini.
+IMAGE_OCR_TARGET_SIDE = int(os.getenv("IMAGE_OCR_TARGET_SIDE", "1280"))
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1536"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+IMAGE_GRAYSCALE_SATURATION = int(os.getenv("IMAGE_GRAYSCALE_SATURATION", "16"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "2000"))
+# Max Hamming distance between 64-bit perceptual hashes to count as the same image.
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "4"))
+# The hash alone can't tell two pages of text apart, so a hash match must also
+# agree with the cached 64x64 grayscale thumbnail: at most this many pixels
+# may differ by more than IMAGE_CACHE_PIXEL_TOLERANCE gray levels.
+IMAGE_CACHE_MAX_CHANGED_PIXELS = int(os.getenv("IMAGE_CACHE_MAX_CHANGED_PIXELS", "4"))
+IMAGE_CACHE_PIXEL_TOLERANCE = int(os.getenv("IMAGE_CACHE_PIXEL_TOLERANCE", "32"))
+# Album photos arrive as separate updates; wait this long after the last one
+# (but never longer than MEDIA_GROUP_MAX_WAIT) before translating them together.
+MEDIA_GROUP_WINDOW = float(os.getenv("MEDIA_GROUP_WINDOW", "0.6"))
+MEDIA_GROUP_MAX_WAIT = float(os.getenv("MEDIA_GROUP_MAX_WAIT", "3.0"))
+
+# Synthesized speech is cached on disk, keyed by normalized text + language.
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+# gTTS threads, and how many sentence segments may wait before new requests
+# get a "busy" reply. Longer texts are synthesized in segments of this size.
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+TTS_MAX_PENDING = int(os.getenv("TTS_MAX_PENDING", "40"))
+TTS_SEGMENT_CHARS = int(os.getenv("TTS_SEGMENT_CHARS", "300"))
+# Opt-in: start synthesizing the translation as soon as it is sent, so a
+# "listen" tap within TTS_SPECULATIVE_TTL seconds is answered immediately.
+TTS_SPECULATIVE = os.getenv("TTS_SPECULATIVE", "false").lower() in ("1", "true", "yes")
+TTS_SPECULATIVE_SOURCE = os.getenv("TTS_SPECULATIVE_SOURCE", "false").lower() in ("1", "true", "yes")
+TTS_SPECULATIVE_TTL = float(os.getenv("TTS_SPECULATIVE_TTL", "120"))
+
+# Document / long-text translation. Chunks are sized by an estimate of
+# ~4 characters per token and translated DOC_CONCURRENCY at a time.
+DOC_EXTENSIONS = (".txt", ".srt", ".md")
+DOC_MAX_BYTES = int(os.getenv("DOC_MAX_BYTES", str(5 * 1024 * 1024)))
+DOC_CHUNK_TOKENS = int(os.getenv("DOC_CHUNK_TOKENS", "1200"))
+DOC_CONCURRENCY = int(os.getenv("DOC_CONCURRENCY", "4"))
+DOC_PROGRESS_INTERVAL = float(os.getenv("DOC_PROGRESS_INTERVAL", "2.0"))
+# Messages longer than this go through the chunked translator.
+LONG_TEXT_CHARS = int(os.getenv("LONG_TEXT_CHARS", "2500"))
+
+# Optional word lists (<language>.txt, e.g. english.txt) used by the answer
+# grader to tell a misspelling from a different real word.
+ANSWER_WORDLISTS_DIR = os.getenv("ANSWER_WORDLISTS_DIR", "wordlists")
+
+# Updates of one chat are handled in order; at most this many handlers run
+# at once across all chats.
+SCHEDULER_MAX_WORKERS = int(os.getenv("SCHEDULER_MAX_WORKERS", "64"))
+
+# Per-user flood control: feature -> [max requests, window in seconds]. The
+# feature comes from the handler's `throttle` flag; "any" caps the sum of all
+# flagged requests of one user.
+THROTTLE_LIMITS = json.loads(os.getenv(
+    "THROTTLE_LIMITS",
+    '{"translate": [6, 10], "image": [4, 30], "learn": [8, 30], "chat": [8, 30], '
+    '"tts": [6, 30], "fact": [3, 30], "any": [30, 60]}'
+))
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "20000"))
+
+# Admission control: the summed weight of running updates may not exceed
+# ADMISSION_BUDGET; beyond it new work is refused with a "busy" reply. Menu
+# navigation weighs 0 and is always let through.
+ADMISSION_BUDGET = float(os.getenv("ADMISSION_BUDGET", "96"))
+ADMISSION_WEIGHTS = json.loads(os.getenv(
+    "ADMISSION_WEIGHTS",
+    '{"nav": 0, "translate": 2, "tts": 2, "learn": 2, "fact": 2, "chat": 3, "image": 4, "document": 4}'
+))
+ADMISSION_NOTICE_COOLDOWN = float(os.getenv("ADMISSION_NOTICE_COOLDOWN", "10"))
+
+# Outgoing message pacing (messages per second), kept under Telegram's limits:
+# ~30/s overall, ~1/s per private chat, 20/min per group. The overall rate is
+# for the whole bot and is split evenly between BOT_WORKERS processes.
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "28"))
+SEND_GLOBAL_BURST = float(os.getenv("SEND_GLOBAL_BURST", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "4"))
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", str(20 / 60)))
+SEND_GROUP_BURST = float(os.getenv("SEND_GROUP_BURST", "3"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+SEND_MAX_RETRY_AFTER = float(os.getenv("SEND_MAX_RETRY_AFTER", "60"))
+
+# "polling" (default) or "webhook". In webhook mode an aiohttp server listens
+# on WEBAPP_HOST:WEBAPP_PORT and Telegram is pointed at WEBHOOK_BASE_URL +
+# WEBHOOK_PATH, e.g. behind a reverse proxy that terminates TLS.
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_URL = f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}"
+# Telegram echoes this in X-Telegram-Bot-Api-Secret-Token; derived from the
+# bot token when not set so the server and set_webhook.py always agree.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or (
+    hashlib.sha256(TELEGRAM_TOKEN.encode()).hexdigest() if TELEGRAM_TOKEN else None
+)
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+# BOT_WORKERS > 1 runs a supervisor: one receiver process (polling or webhook,
+# per BOT_MODE) hands updates to that many worker processes, sharded by user id.
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+WORKER_HEALTH_INTERVAL = float(os.getenv("WORKER_HEALTH_INTERVAL", "2"))
+WORKER_HEARTBEAT_TIMEOUT = float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "30"))
+WORKER_STARTUP_GRACE = float(os.getenv("WORKER_STARTUP_GRACE", "60"))
+
+# Persistent job queue (SQLite) for OCR, TTS and chat replies. Jobs are
+# sharded by user id like updates, one shard per BOT_WORKERS process, so each
+# worker runs the jobs of its own users.
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "8"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "2"))
+JOB_RETRY_MAX = float(os.getenv("JOB_RETRY_MAX", "60"))
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+# Update ids already handled, to drop webhook retries and re-fetched updates.
+# Kept for UPDATE_DEDUP_WINDOW seconds (Telegram holds undelivered updates for
+# 24 hours), at most UPDATE_DEDUP_MAX of them, and written to SQLite in batches.
+UPDATE_DEDUP_WINDOW = float(os.getenv("UPDATE_DEDUP_WINDOW", str(24 * 3600)))
+UPDATE_DEDUP_MAX = int(os.getenv("UPDATE_DEDUP_MAX", "100000"))
+UPDATE_DEDUP_FLUSH_INTERVAL = float(os.getenv("UPDATE_DEDUP_FLUSH_INTERVAL", "1"))
+
+# Outbound HTTP (Bot API, gTTS, Gemini). PythonAnywhere only allows traffic
+# through its proxy, so it is the default there; elsewhere set PROXY_URL.
+_ON_PYTHONANYWHERE = 'PYTHONANYWHERE_VERSION' in os.environ
+PROXY_URL = os.getenv("PROXY_URL") or ("http://proxy.server:3128" if _ON_PYTHONANYWHERE else None)
+# The Gemini SDK talks gRPC, and the SDK's configure() takes no channel
+# options, so gRPC can only get its proxy from the environment. Set once here,
+# before anything imports grpc; grpc_proxy is ignored by every other client.
+if PROXY_URL:
+    os.environ.setdefault("grpc_proxy", PROXY_URL)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "50"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+
+ADMIN_USER_IDS = {
+    int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",")
+    if user_id.strip()
+}
 #
 """
 import os
@@ -1,5 +1,7 @@
 import aiosqlite
+import json
 import logging
+import time
 from config import DB_NAME
 from datetime import date, timedelta
 
@@ -33,6 +35,52 @@ async def init_db():
                 FOREIGN KEY (user_id) REFERENCES users (user_id)
             )
         ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS voice_file_ids (
+                content_hash TEXT PRIMARY KEY,
+                file_id TEXT NOT NULL,
+                uses INTEGER DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_used_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                shard INTEGER NOT NULL DEFAULT 0,
+                payload TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                dedupe_key TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                available_at REAL NOT NULL,
+                locked_until REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            )
+        ''')
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (shard, status, priority, available_at)"
+        )
+        # A dedupe key only blocks while an equal job is still pending.
+        await db.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key) "
+            "WHERE status IN ('queued', 'running')"
+        )
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS seen_updates (
+                update_id INTEGER PRIMARY KEY,
+                seen_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_seen_updates_seen_at ON seen_updates (seen_at)"
+        )
         await db.commit()
     logging.info("Database initialized.")
 
@@ -141,4 +189,173 @@ async def clear_chat_history(user_id: int):
     async with aiosqlite.connect(DB_NAME) as db:
         await db.execute("DELETE FROM chat_history WHERE user_id = ?", (user_id,))
         await db.commit()
-    logging.info(f"Chat history cleared for user {user_id}")
\ No newline at end of file
+    logging.info(f"Chat history cleared for user {user_id}")
+
+async def get_voice_file_id(content_hash: str) -> str | None:
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute(
+            "SELECT file_id FROM voice_file_ids WHERE content_hash = ?", (content_hash,)
+        )
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        await db.execute(
+            "UPDATE voice_file_ids SET uses = uses + 1, last_used_at = CURRENT_TIMESTAMP "
+            "WHERE content_hash = ?", (content_hash,)
+        )
+        await db.commit()
+        return row[0]
+
+async def save_voice_file_id(content_hash: str, file_id: str):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute(
+            "INSERT OR REPLACE INTO voice_file_ids (content_hash, file_id) VALUES (?, ?)",
+            (content_hash, file_id)
+        )
+        await db.commit()
+
+async def delete_voice_file_id(content_hash: str):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute("DELETE FROM voice_file_ids WHERE content_hash = ?", (content_hash,))
+        await db.commit()
+
+async def enqueue_job(
+    kind: str, user_id: int, chat_id: int, shard: int, payload: dict,
+    priority: int = 0, dedupe_key: str | None = None, max_attempts: int = 3
+) -> int | None:
+    now = time.time()
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute(
+            "INSERT OR IGNORE INTO jobs (kind, user_id, chat_id, shard, payload, priority, "
+            "dedupe_key, max_attempts, available_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, user_id, chat_id, shard, json.dumps(payload), priority, dedupe_key, max_attempts, now, now)
+        )
+        await db.commit()
+        # rowcount is 0 when a pending job with the same dedupe key exists.
+        return cursor.lastrowid if cursor.rowcount else None
+
+_READY_JOB = (
+    "SELECT * FROM jobs WHERE shard = ? AND ("
+    "  (status = 'queued' AND available_at <= ?) OR (status = 'running' AND locked_until <= ?)"
+    ") AND user_id NOT IN ("
+    "  SELECT user_id FROM jobs WHERE shard = ? AND status = 'running' AND locked_until > ?"
+    ") ORDER BY priority, available_at, id LIMIT 1"
+)
+
+async def claim_job(shard: int, lease_seconds: float) -> dict | None:
+    # Takes the most urgent ready job of the shard, skipping users that
+    # already have a job running so each user's jobs run in order. Jobs whose
+    # lease ran out (the worker died) are ready again.
+    now = time.time()
+    params = (shard, now, now, shard, now)
+    async with aiosqlite.connect(DB_NAME) as db:
+        db.row_factory = aiosqlite.Row
+        # A plain read first: idle polls must not take the write lock.
+        cursor = await db.execute(_READY_JOB, params)
+        job = await cursor.fetchone()
+        await cursor.close()
+        if not job:
+            return None
+        # Another worker may have claimed it meanwhile, so look again under the lock.
+        await db.execute("BEGIN IMMEDIATE")
+        cursor = await db.execute(_READY_JOB, params)
+        job = await cursor.fetchone()
+        if not job:
+            await db.commit()
+            return None
+        await db.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ? WHERE id = ?",
+            (now + lease_seconds, job['id'])
+        )
+        await db.commit()
+    job = dict(job)
+    job['attempts'] += 1
+    job['payload'] = json.loads(job['payload'])
+    return job
+
+async def extend_job_lease(job_id: int, lease_seconds: float):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute(
+            "UPDATE jobs SET locked_until = ? WHERE id = ? AND status = 'running'",
+            (time.time() + lease_seconds, job_id)
+        )
+        await db.commit()
+
+async def update_job_payload(job_id: int, payload: dict):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute("UPDATE jobs SET payload = ? WHERE id = ?", (json.dumps(payload), job_id))
+        await db.commit()
+
+async def finish_job(job_id: int, status: str = 'done', error: str | None = None):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute(
+            "UPDATE jobs SET status = ?, last_error = ?, locked_until = NULL, finished_at = ? WHERE id = ?",
+            (status, error, time.time(), job_id)
+        )
+        await db.commit()
+
+async def retry_job(job_id: int, delay: float, error: str):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute(
+            "UPDATE jobs SET status = 'queued', available_at = ?, locked_until = NULL, last_error = ? WHERE id = ?",
+            (time.time() + delay, error, job_id)
+        )
+        await db.commit()
+
+async def requeue_running_jobs(shard: int) -> int:
+    # Called when a shard's runner starts: whatever it had running before a
+    # crash or restart is picked up again right away, in its old place.
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute(
+            "UPDATE jobs SET status = 'queued', locked_until = NULL WHERE shard = ? AND status = 'running'",
+            (shard,)
+        )
+        await db.commit()
+        return cursor.rowcount
+
+async def reshard_jobs(shards: int) -> int:
+    # Jobs left on shards that no longer exist after BOT_WORKERS went down
+    # would never be claimed; move them to the shard now serving their user.
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute(
+            "UPDATE jobs SET shard = user_id % ? WHERE shard >= ? AND status IN ('queued', 'running')",
+            (shards, shards)
+        )
+        await db.commit()
+        return cursor.rowcount
+
+async def count_jobs(shard: int) -> dict:
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE shard = ? GROUP BY status", (shard,)
+        )
+        return {status: count for status, count in await cursor.fetchall()}
+
+async def purge_finished_jobs(older_than_seconds: float) -> int:
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - older_than_seconds,)
+        )
+        await db.commit()
+        return cursor.rowcount
+
+async def load_seen_updates(since: float, limit: int) -> list[tuple[int, float]]:
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute(
+            "SELECT update_id, seen_at FROM seen_updates WHERE seen_at >= ? ORDER BY seen_at DESC LIMIT ?",
+            (since, limit)
+        )
+        rows = await cursor.fetchall()
+    return list(reversed(rows))
+
+async def save_seen_updates(rows: list[tuple[int, float]]):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.executemany("INSERT OR IGNORE INTO seen_updates (update_id, seen_at) VALUES (?, ?)", rows)
+        await db.commit()
+
+async def prune_seen_updates(older_than: float) -> int:
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute("DELETE FROM seen_updates WHERE seen_at < ?", (older_than,))
+        await db.commit()
+        return cursor.rowcount
@@ -1,40 +1,21 @@
 #!/home/8Khumaryan8/.virtualenvs/my-bot-venv/bin/python
 # -*- coding: utf-8 -*-
 
-import os
+import asyncio
 import logging
 
-# --- ՍԿԻԶԲ։ Proxy-ի գլոբալ կարգավորում ---
-# Սա պետք է լինի ամենաառաջին գործողությունը, մինչև ցանցային գրադարանների import-ը
-# Սա կաշխատի և՛ aiogram-ի, և՛ google-generativeai-ի համար
-if 'PYTHONANYWHERE_VERSION' in os.environ or os.environ.get('HOME', '').startswith('/home/'):
-    # Նախնական լոգինգ՝ ստուգելու համար, որ այս բլոկն աշխատում է
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
-    logging.info("PythonAnywhere environment detected. Setting global HTTPS_PROXY.")
-    proxy_url = "http://proxy.server:3128"
-    os.environ['HTTPS_PROXY'] = proxy_url
-    os.environ['HTTP_PROXY'] = proxy_url
-# --- ԱՎԱՐՏ։ Proxy-ի գլոբալ կարգավորում ---
-
-
-import asyncio
-from pathlib import Path
+# First import, so the profiler's clock starts before anything heavy loads.
+from bot.utils.startup_profiler import startup_profiler
 
-from aiogram import Bot, Dispatcher, F
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
+with startup_profiler.stage("import aiogram"):
+    import aiogram
 
-from config import TELEGRAM_TOKEN
-from database.db_utils import init_db
-from bot.middlewares.localization import Localization, get_all_translations
-from bot.handlers import (
-    common_handlers,
-    settings_handlers,
-    translate_handlers,
-    learning_handlers,
-    chat_handlers,
-)
+with startup_profiler.stage("import bot modules"):
+    from config import TELEGRAM_TOKEN, BOT_MODE, BOT_WORKERS
+    from database.db_utils import init_db
+    from bot.app import create_bot, create_dispatcher
+    from bot.webhook import run_webhook
+    from bot.supervisor import run_supervisor
 
 async def main():
     # Լոգինգի հիմնական կոնֆիգուրացիան՝ մանրամասն ֆորմատով
@@ -51,54 +32,24 @@ async def main():
         logging.critical("TELEGRAM_BOT_TOKEN not found in environment variables.")
         return
 
-    await init_db()
-
-    # Bot-ը ստեղծում ենք առանց session-ի, այն ինքը կօգտագործի համակարգային proxy-ն
-    bot = Bot(
-        token=TELEGRAM_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    with startup_profiler.stage("init database"):
+        await init_db()
 
-    locales_dir = Path(__file__).parent / "locales"
-    loc_middleware = Localization(locales_dir=locales_dir)
-    dp.update.middleware(loc_middleware)
-    bot.loc_middleware = loc_middleware
-
-    dp.include_router(common_handlers.common_router)
-    dp.include_router(settings_handlers.settings_router)
-    dp.include_router(translate_handlers.translate_router)
-    dp.include_router(learning_handlers.learning_router)
-    dp.include_router(chat_handlers.chat_router)
-
-    # ------------------ Reply Keyboard Handlers ------------------
-    all_translate_texts = get_all_translations("translate_button", loc_middleware.locales)
-    @dp.message(F.text.in_(all_translate_texts))
-    async def handle_translate_text(message, user_db, state):
-        await translate_handlers.cb_enter_translator(message, user_db, state)
-
-    all_learn_texts = get_all_translations("learn_button", loc_middleware.locales)
-    @dp.message(F.text.in_(all_learn_texts))
-    async def handle_learn_text(message, user_db, state):
-        await learning_handlers.cb_main_menu_learn(message, user_db, state)
-
-    all_chat_texts = get_all_translations("chat_button", loc_middleware.locales)
-    @dp.message(F.text.in_(all_chat_texts))
-    async def handle_chat_text(message, state):
-        await chat_handlers.cb_chat_entry(message, state)
+    if BOT_WORKERS > 1:
+        await run_supervisor(BOT_WORKERS, BOT_MODE)
+        return
 
-    all_settings_texts = get_all_translations("settings_button", loc_middleware.locales)
-    @dp.message(F.text.in_(all_settings_texts))
-    async def handle_settings_text(message, user_db, state):
-        await settings_handlers.cb_main_menu_settings(message, user_db, state)
-    # -----------------------------------------------------------
+    bot = create_bot()
+    dp = create_dispatcher(bot)
 
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
     except Exception as e:
-        logging.critical(f"An error occurred during polling: {e}")
+        logging.critical(f"An error occurred while running the bot ({BOT_MODE}): {e}")
     finally:
         if bot.session:
             await bot.session.close()
@@ -1,28 +1,34 @@
+import argparse
 import asyncio
-import os
-from dotenv import load_dotenv
 
-# .env ֆայլից տվյալների բեռնում
-load_dotenv('Arvion_Lingua_AI/.env') # Համոզվեք, որ ճանապարհը ճիշտ է ձեր կառուցվածքի համար
+from aiogram import Bot
 
-TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-# ԿԱՐԵՎՈՐ: Փոխարինեք 8Khumaryan8-ը ձեր PythonAnywhere-ի username-ով
-WEBHOOK_HOST = "https://8Khumaryan8.pythonanywhere.com"
-WEBHOOK_PATH = f"/{TOKEN}"
-WEBHOOK_URL = f"{WEBHOOK_HOST}{WEBHOOK_PATH}"
+from config import TELEGRAM_TOKEN, WEBHOOK_URL, WEBHOOK_SECRET
+from bot.utils.http import TunedAiohttpSession
 
-async def set_hook():
-    # Սա պարզ, առանց բարդ տրամաբանության սկրիպտ է
-    from aiogram import Bot
+# Registers (or removes) the webhook that `BOT_MODE=webhook python main.py`
+# serves. main.py also registers it on startup; this is for manual changes.
 
-    bot = Bot(token=TOKEN)
-    await bot.delete_webhook(drop_pending_updates=True)
-    await bot.set_webhook(url=WEBHOOK_URL)
-    print(f"Webhook has been set to {WEBHOOK_URL}")
-    await bot.session.close()
+async def set_hook(delete: bool):
+    bot = Bot(token=TELEGRAM_TOKEN, session=TunedAiohttpSession())
+    try:
+        if delete:
+            await bot.delete_webhook(drop_pending_updates=False)
+            print("Webhook removed; the bot can be run with long polling again.")
+            return
+        await bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+        info = await bot.get_webhook_info()
+        print(f"Webhook has been set to {info.url} (pending updates: {info.pending_update_count})")
+    finally:
+        await bot.session.close()
 
 if __name__ == "__main__":
-    if not TOKEN:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delete", action="store_true", help="remove the webhook instead")
+    args = parser.parse_args()
+    if not TELEGRAM_TOKEN:
         print("Error: TELEGRAM_BOT_TOKEN not found. Make sure your .env file is correct.")
+    elif not args.delete and not WEBHOOK_URL.startswith("https://"):
+        print("Error: set WEBHOOK_BASE_URL to the public https:// address of the webhook server.")
     else:
-        asyncio.run(set_hook())
\ No newline at end of file
+        asyncio.run(set_hook(args.delete))
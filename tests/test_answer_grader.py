@@ -0,0 +1,33 @@
+from bot.services.answer_grader import grade_answer, normalize_answer, CORRECT, TYPO, INCORRECT
+
+
+def test_exact_answer_with_accents_is_correct():
+    assert grade_answer("Café", "café", lang_name="French") == CORRECT
+    assert grade_answer("мой", "мой", lang_name="Russian") == CORRECT
+
+
+def test_missing_accents_are_a_typo():
+    assert grade_answer("cafe", "café", lang_name="French") == TYPO
+    assert grade_answer("ano", "año", lang_name="Spanish") == TYPO
+    assert grade_answer("мои", "мой", lang_name="Russian") == TYPO
+    assert grade_answer("ёлка", "елка", lang_name="Russian") == TYPO
+
+
+def test_hindi_vowel_signs_are_kept():
+    assert grade_answer("कल", "कुल", lang_name="Hindi") != CORRECT
+    assert normalize_answer("कुल") == "कुल"
+
+
+def test_japanese_voicing_marks_are_kept():
+    assert grade_answer("かき", "かぎ", lang_name="Japanese") != CORRECT
+    assert normalize_answer("が") == "が"
+
+
+def test_near_miss_that_is_a_word_is_incorrect():
+    assert grade_answer("hause", "house", lang_name="English", known={"house", "horse"}) == TYPO
+    assert grade_answer("horse", "house", lang_name="English", known={"house", "horse"}) == INCORRECT
+
+
+def test_near_miss_without_word_list_goes_to_gemini():
+    assert grade_answer("horse", "house", lang_name="English") is None
+    assert grade_answer("hause", "house", lang_name="English") is None
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update, Message, Chat, User
+
+from bot.middlewares.chat_scheduler import ChatScheduler
+
+
+class Steps(StatesGroup):
+    b = State()
+
+
+def make_update(update_id: int, text: str) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), text=text,
+        chat=Chat(id=1, type="private"), from_user=User(id=1, is_bot=False, first_name="u"),
+    ))
+
+
+def test_queued_update_sees_state_set_by_previous_one():
+    handled = []
+    router = Router()
+
+    @router.message(StateFilter(None))
+    async def go(message: Message, state: FSMContext):
+        await asyncio.sleep(0.05)
+        await state.set_state(Steps.b)
+        handled.append("go->b")
+
+    @router.message(Steps.b)
+    async def in_b(message: Message, state: FSMContext):
+        handled.append("b")
+
+    async def main():
+        dp = Dispatcher(storage=MemoryStorage())
+        dp.update.outer_middleware(ChatScheduler())
+        dp.include_router(router)
+        bot = Bot("42:TEST")
+        await asyncio.gather(
+            dp.feed_update(bot, make_update(1, "first")),
+            dp.feed_update(bot, make_update(2, "second")),
+        )
+        await bot.session.close()
+
+    asyncio.run(main())
+    assert handled == ["go->b", "b"]
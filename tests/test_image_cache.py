@@ -0,0 +1,52 @@
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+from bot.services.image_cache import ImageTextCache
+from bot.services.image_pipeline import preprocess_image
+
+FONT = ImageFont.load_default(size=28)
+WORDS = "menu price soup salad coffee tea open closed daily hours fresh bread".split()
+
+
+def text_page(seed: int) -> bytes:
+    # Same layout every time; only the words change.
+    rng = random.Random(seed)
+    img = Image.new("RGB", (800, 1000), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 800, 120), fill=(30, 60, 120))
+    for line in range(14):
+        draw.text((40, 160 + line * 55), " ".join(rng.choice(WORDS) for _ in range(5)), fill="black", font=FONT)
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+def reencoded(raw: bytes) -> bytes:
+    img = Image.open(io.BytesIO(raw)).convert("RGB")
+    img = img.resize((img.width // 2, img.height // 2))
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=50)
+    return out.getvalue()
+
+
+def cache_page(cache: ImageTextCache, raw: bytes, text: str):
+    image = preprocess_image(raw)
+    cache.put(["id"], image.phash, image.width / image.height, image.thumbnail, text, "English", "French", text)
+
+
+def test_different_text_pages_do_not_collide():
+    cache = ImageTextCache(max_distance=8)
+    cache_page(cache, text_page(0), "page 0")
+    for seed in range(1, 6):
+        other = preprocess_image(text_page(seed))
+        assert cache.get_by_phash(other.phash, other.width / other.height, other.thumbnail) is None
+
+
+def test_reencoded_copy_hits():
+    cache = ImageTextCache()
+    cache_page(cache, text_page(0), "page 0")
+    copy = preprocess_image(reencoded(text_page(0)))
+    entry = cache.get_by_phash(copy.phash, copy.width / copy.height, copy.thumbnail)
+    assert entry is not None and entry.found_text == "page 0"
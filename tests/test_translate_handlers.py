@@ -0,0 +1,39 @@
+import asyncio
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update, Message, Chat, User, PhotoSize
+
+from bot.handlers import translate_handlers
+from bot.states.app_states import AppStates
+
+
+def make_photo_update(update_id: int) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(),
+        photo=[PhotoSize(file_id="f", file_unique_id="u", width=90, height=90)],
+        chat=Chat(id=1, type="private"), from_user=User(id=1, is_bot=False, first_name="u"),
+    ))
+
+
+def test_photo_after_translation_is_translated(monkeypatch):
+    enqueued = []
+
+    async def enqueue(kind, message, state, payload=None, **kwargs):
+        enqueued.append(kind)
+
+    monkeypatch.setattr(translate_handlers.job_runner, "enqueue", enqueue)
+
+    async def main():
+        dp = Dispatcher(storage=MemoryStorage())
+        dp.include_router(translate_handlers.translate_router)
+        bot = Bot("42:TEST")
+        key = StorageKey(bot_id=bot.id, chat_id=1, user_id=1)
+        await dp.storage.set_state(key, AppStates.awaiting_tts_choice)
+        await dp.feed_update(bot, make_photo_update(1), i18n={})
+        await bot.session.close()
+
+    asyncio.run(main())
+    assert enqueued == ["image_translation"]